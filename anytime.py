@@ -0,0 +1,148 @@
+'''
+    Anytime solving
+
+    Gives the constructive solution at once, then improves it until the time
+    budget runs out, and returns the best solution found so far:
+    - boards of at most 16 cells: weighted A* (f = g + w * h, Manhattan distance)
+      with decreasing weights. A run with weight w finds a solution at most
+      w times the optimum, and it only looks for solutions shorter than the
+      best one, so a run that finds nothing proves the best one optimal.
+    - bigger boards: the window passes of the optimizer with growing windows.
+    The report gives the length and a lower bound of the optimal length.
+'''
+
+import math
+import numpy as np
+import time
+from heapq import heappop, heappush
+from board_state import BoardState, PACK_LIMIT, decode_moves, encode_moves, make_packed
+from ida_star import get_searcher
+from optimizer import optimize
+from puzzle import manhattan_distance
+
+
+DEFAULT_TIME_BUDGET = 2.0  # s
+WEIGHTS = (3, 2, 1.5, 1.25, 1)
+WINDOWS = (8, 12, 16, 20, 24)
+# A weighted A* run gives up above this many boards, it keeps all of them
+MAX_NODES = 500_000
+# The time is checked after this many boards
+CHECK_EVERY = 1024
+
+
+def weighted_astar(board, weight, limit, should_stop=None, searcher=None):
+    '''
+        Weighted A* on a board of at most 16 cells, only solutions shorter than limit are looked for
+        returns (move codes or None if there is no shorter solution, whether the run finished)
+    '''
+    state = BoardState.from_board(board)
+    rows, cols = state.rows, state.cols
+    if rows * cols > PACK_LIMIT:
+        raise ValueError(f'Weighted A* only runs on boards of at most {PACK_LIMIT} cells')
+    searcher = searcher or get_searcher(rows, cols)
+    distance = searcher.manhattan
+    tables = state.tables
+    neighbors = tables.moves_from
+    blank = state.blank
+
+    start = state.pack()
+    h = sum(distance[tile][cell] for cell, tile in enumerate(state.tiles) if tile != blank)
+    # seen[board] = (g, previous board, move)
+    seen = {start: (0, None, None)}
+    heap = [(weight * h, 0, start, state.blank_cell, h)]
+
+    while heap:
+        if not len(seen) % CHECK_EVERY and should_stop is not None and should_stop() \
+                or len(seen) > MAX_NODES:
+            return None, False
+        _, g, packed, blank_cell, h = heappop(heap)
+        if g > seen[packed][0]:
+            continue  # reached again with a smaller g
+        if h == 0:
+            moves = []
+            while packed != start:
+                _, packed, move = seen[packed]
+                moves.append(move)
+            return moves[::-1], True
+
+        for move, cell in neighbors[blank_cell]:
+            tile = (packed >> (4 * cell)) & (PACK_LIMIT - 1)
+            new_h = h + distance[tile][blank_cell] - distance[tile][cell]
+            new_g = g + 1
+            if new_g + new_h >= limit:
+                continue
+            new_packed, _ = make_packed(packed, blank_cell, move, tables)
+            if new_packed in seen and seen[new_packed][0] <= new_g:
+                continue
+            seen[new_packed] = (new_g, packed, move)
+            heappush(heap, (new_g + weight * new_h, new_g, new_packed, cell, new_h))
+    return None, True
+
+
+def lower_bound(board, searcher=None) -> int:
+    '''
+        Manhattan distance, with the linear conflicts on small boards
+    '''
+    if searcher is not None:
+        return searcher.heuristic(BoardState.from_board(board).tiles)
+    return int(manhattan_distance(np.asarray(board)[None])[0])
+
+
+def solve_anytime_report(board, time_budget=DEFAULT_TIME_BUDGET, should_stop=None) -> dict:
+    '''
+        returns {'moves': names, 'length', 'lower_bound', 'optimal', 'weight', 'seconds', 'steps'}
+        weight: the weight of the last weighted A* run that finished, None if none did
+        steps: (what, length) after every improvement step
+    '''
+    from solver import solve_board  # solver imports this module for SOLVERS
+
+    start = time.perf_counter()
+    deadline = start + time_budget
+
+    def out_of_time():
+        return time.perf_counter() >= deadline or (should_stop is not None and should_stop())
+
+    rows, cols = len(board), len(board[0])
+    searcher = get_searcher(rows, cols) if rows * cols <= PACK_LIMIT else None
+    best = encode_moves(solve_board(board))
+    bound = lower_bound(board, searcher)
+    steps = [('constructive', len(best))]
+    weight = None
+
+    if searcher is not None:
+        for weight_now in WEIGHTS:
+            if bound >= len(best) or out_of_time():
+                break
+            found, finished = weighted_astar(board, weight_now, len(best), out_of_time, searcher)
+            if not finished:
+                break
+            weight = weight_now
+            if found is None:
+                bound = len(best)  # there is no shorter solution
+            else:
+                best = found
+                bound = max(bound, math.ceil(len(found) / weight_now))
+            steps.append((f'weighted A* w={weight_now}', len(best)))
+    else:
+        for window in WINDOWS:
+            if out_of_time():
+                break
+            shorter = optimize(board, best, window, should_stop=out_of_time)
+            if len(shorter) < len(best):
+                best = shorter
+            steps.append((f'window {window}', len(best)))
+
+    return {'moves': decode_moves(best), 'length': len(best), 'lower_bound': bound,
+            'optimal': bound == len(best), 'weight': weight,
+            'seconds': time.perf_counter() - start, 'steps': steps}
+
+
+def solve_anytime(board, should_stop=None, time_budget=DEFAULT_TIME_BUDGET, report=None) -> list:
+    '''
+        Returns the best moves found in time_budget seconds, the board is not changed.
+        report: if given, a dict that gets the report of solve_anytime_report
+    '''
+    result = solve_anytime_report(board, time_budget, should_stop)
+    if report is not None:
+        report.update(result)
+    return result['moves']
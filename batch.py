@@ -0,0 +1,252 @@
+'''
+    Batch solver
+
+    Solves every board csv (same format as solvable_board.csv) of the given
+    directories or glob patterns on all cores, and writes one JSON line per
+    board to the output as soon as it is solved:
+        {"file": ..., "solvable": true, "length": 52, "moves": [...], "seconds": 0.01}
+    Unsolvable boards get "solvable": false, unreadable ones or the ones the
+    method cannot solve an "error".
+    Board datasets (see dataset.py) are solved chunksize boards per task,
+    their lines have the "index" of the board in the dataset.
+    Solutions come from the solution cache when the board was solved before
+    ("cached": true), see solution_cache.py.
+    The missing pattern databases and perfect tables of the sizes are built
+    before the workers start, they cannot start the processes of a build.
+
+    Usage: python batch.py [-o results.jsonl] [-m method] [-j jobs] [-c chunksize] [--no-cache]
+                           directory_or_glob_or_dataset ...
+           python batch.py --self-check [-j jobs]
+               solves a few boards with the pdb method starting without a database,
+               the exit code is 1 if one is not solved
+'''
+
+import json
+import numpy as np
+import os
+import sys
+import tempfile
+import time
+from getopt import getopt
+from multiprocessing import Pool
+from sys import argv
+import pattern_db
+import perfect_table
+from dataset import find_boards, is_dataset, open_dataset, read_header
+from puzzle import generate_puzzles, is_solvable, validate_boards
+from solution_cache import SolutionCache
+from solver import SOLVERS
+
+
+DEFAULT_OUTPUT = 'results.jsonl'
+DEFAULT_METHOD = 'constructive'
+# Files handed to a worker at once
+DEFAULT_CHUNKSIZE = 16
+# The solution cache of the worker process, opened on its first board
+CACHE = None
+# Boards of the self check
+SELF_CHECK_BOARDS = 20
+
+
+def solve_file(path, method=DEFAULT_METHOD, use_cache=True) -> dict:
+    '''
+        returns the result line of one board, never raises for a bad board
+    '''
+    start = time.perf_counter()
+    result = {'file': path}
+    try:
+        board = np.genfromtxt(path, delimiter=',', dtype=int, ndmin=2)
+        validate_boards(board)
+    except (OSError, ValueError) as error:
+        result['error'] = str(error)
+        return result
+    return solve_board(board, result, start, method, use_cache)
+
+
+def solve_range(path, first, last, method=DEFAULT_METHOD, use_cache=True) -> list:
+    '''
+        returns the result lines of the boards first..last-1 of a dataset, checked before
+    '''
+    boards = open_dataset(path, validate=False)[first:last].astype(int)  # the solvers use int boards
+    return [solve_board(board, {'file': path, 'index': index}, time.perf_counter(), method, use_cache)
+            for index, board in enumerate(boards, first)]
+
+
+def solve_board(board, result, start, method=DEFAULT_METHOD, use_cache=True) -> dict:
+    '''
+        Adds the size, solvability and moves of a valid board to the result line
+    '''
+    global CACHE
+    result['rows'], result['cols'] = board.shape
+    result['solvable'] = bool(is_solvable(board, validate=False))
+    if result['solvable']:
+        try:
+            if use_cache:
+                CACHE = CACHE or SolutionCache()
+                hits = CACHE.hits
+                moves = CACHE.solve(board, method)
+                result['cached'] = CACHE.hits > hits
+            else:
+                moves = SOLVERS[method](board)
+        except Exception as error:  # one board the method cannot solve does not stop the run
+            result['error'] = f'{type(error).__name__}: {error}'
+        else:
+            result['length'] = len(moves)
+            result['moves'] = moves
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def _solve(job) -> list:
+    source, method, use_cache = job
+    if isinstance(source, tuple):
+        results = solve_range(*source, method, use_cache)
+    else:
+        results = [solve_file(path, method, use_cache) for path in source]
+    if CACHE:
+        CACHE.flush()  # the pool's processes end without closing it
+    return results
+
+
+def board_shape(path):
+    '''
+        rows, cols of a board csv from its lines and commas, None if it cannot be read
+    '''
+    try:
+        with open(path) as f:
+            lines = [line for line in f if line.strip()]
+    except (OSError, UnicodeDecodeError):
+        return None
+    return (len(lines), lines[0].count(',') + 1) if lines else None
+
+
+def build_tables(method, shapes):
+    '''
+        Builds the missing pattern databases or perfect tables of the sizes the method supports
+    '''
+    for rows, cols in shapes:
+        if method == 'pdb' and pattern_db.supports(rows, cols) \
+                and not os.path.exists(pattern_db.database_path(rows, cols)):
+            print(f'Building the {rows}x{cols} pattern database')
+            pattern_db.build_database(rows, cols)
+        elif method == 'perfect' and perfect_table.supports(rows, cols) \
+                and not os.path.exists(perfect_table.table_path(rows, cols)):
+            perfect_table.build(rows, cols)
+
+
+def init_worker(database_dir, table_dir):
+    '''
+        The workers find the tables where the parent built them
+    '''
+    pattern_db.DATABASE_DIR = database_dir
+    perfect_table.TABLE_DIR = table_dir
+
+
+def solve_files(files, output, method=DEFAULT_METHOD, jobs=None, chunksize=DEFAULT_CHUNKSIZE,
+                use_cache=True, datasets=()) -> dict:
+    '''
+        Solves the files and the boards of the datasets in a process pool,
+        writes the results in the order they finish
+        datasets: (path, number of boards) pairs
+        returns the counts of solved, unsolvable and failed boards
+    '''
+    counts = {'solved': 0, 'unsolvable': 0, 'error': 0}
+    if method in ('pdb', 'perfect'):
+        shapes = {read_header(path)[:2] for path, _ in datasets}
+        build_tables(method, (shapes | set(map(board_shape, files))) - {None})
+    sources = [files[start:start + chunksize] for start in range(0, len(files), chunksize)]
+    sources += [(path, start, min(start + chunksize, count))
+                for path, count in datasets for start in range(0, count, chunksize)]
+    with Pool(jobs, init_worker, (pattern_db.DATABASE_DIR, perfect_table.TABLE_DIR)) as pool, \
+            open(output, 'w') as f:
+        for result in (result for results in pool.imap_unordered(
+                _solve, [(source, method, use_cache) for source in sources]) for result in results):
+            f.write(json.dumps(result) + '\n')
+            f.flush()
+            if 'error' in result:
+                counts['error'] += 1
+            elif result['solvable']:
+                counts['solved'] += 1
+            else:
+                counts['unsolvable'] += 1
+    return counts
+
+
+def self_check(jobs=None) -> list:
+    '''
+        Solves SELF_CHECK_BOARDS 3x3 boards with the pdb method in the pool, starting without
+        a database (it is built in a temporary directory), and verifies the moves
+        returns the result lines of the boards that were not solved
+    '''
+    from verify import verify
+    boards = generate_puzzles(SELF_CHECK_BOARDS, 3, 3, seed=0)
+    database_dir = pattern_db.DATABASE_DIR
+    with tempfile.TemporaryDirectory() as directory:
+        pattern_db.DATABASE_DIR = directory
+        try:
+            files = [os.path.join(directory, f'board_{number}.csv') for number in range(len(boards))]
+            for path, board in zip(files, boards):
+                np.savetxt(path, board, fmt='%d', delimiter=',')
+            output = os.path.join(directory, 'results.jsonl')
+            solve_files(files, output, 'pdb', jobs, use_cache=False)
+            with open(output) as f:
+                results = {result['file']: result for result in map(json.loads, f)}
+        finally:
+            pattern_db.DATABASE_DIR = database_dir
+    results = [results.get(path, {'file': path, 'error': 'no result'}) for path in files]
+    solved = verify(boards, [result.get('moves', []) for result in results])['solved']
+    return [result for result, ok in zip(results, solved) if not ok]
+
+
+def main():
+    output = DEFAULT_OUTPUT
+    method = DEFAULT_METHOD
+    jobs = None
+    chunksize = DEFAULT_CHUNKSIZE
+    use_cache = True
+    check = False
+    opts, sources = getopt(argv[1:], "o:m:j:c:", [
+                           "output=", "method=", "jobs=", "chunksize=", "no-cache", "self-check"])
+    for opt, val in opts:
+        if opt in ("--output", "-o"):
+            output = val
+        elif opt in ("--method", "-m"):
+            if val not in SOLVERS:
+                sys.exit(f'Unknown method: {val}, choose from {", ".join(SOLVERS)}')
+            method = val
+        elif opt in ("--jobs", "-j"):
+            jobs = int(val)
+        elif opt in ("--chunksize", "-c"):
+            chunksize = int(val)
+        elif opt == "--no-cache":
+            use_cache = False
+        elif opt == "--self-check":
+            check = True
+
+    if check:
+        failed = self_check(jobs)
+        for result in failed:
+            print(f'{os.path.basename(result["file"])}: {result.get("error", "not solved")}')
+        print(f'{SELF_CHECK_BOARDS} boards with the pdb method and no database, {len(failed)} not solved')
+        return 1 if failed else 0
+
+    datasets = []
+    for source in [source for source in sources if os.path.isfile(source) and is_dataset(source)]:
+        try:
+            datasets.append((source, len(open_dataset(source))))
+        except ValueError as error:
+            sys.exit(str(error))
+        sources.remove(source)
+    files = find_boards(sources)
+    if not files and not datasets:
+        sys.exit('No board files found')
+
+    start = time.perf_counter()
+    counts = solve_files(files, output, method, jobs, chunksize, use_cache, datasets)
+    print(f'{len(files) + sum(count for _, count in datasets)} boards in {time.perf_counter() - start:.2f} s: '
+          f'{counts["solved"]} solved, {counts["unsolvable"]} unsolvable, '
+          f'{counts["error"]} failed, results in {output}')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
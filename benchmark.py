@@ -0,0 +1,318 @@
+'''
+    Solver benchmarks
+
+    Solves the same seeded boards with every method and size (the optimal
+    methods only on the small ones, and never on the sizes they do not
+    support), and measures the wall time, the number of moves, the moves per second and the peak
+    memory (tracemalloc, one extra solve per size, so the timing is not slowed
+    down by it). The fitted exponent of time ~ cells^k is the scaling curve
+    in one number. The anytime method runs for its time budget, so it is only
+    measured when it is asked for (-m), with a short fixed budget, and it is
+    left out of the scaling exponents. Micro benchmarks time is_solvable, generate_new_puzzle and
+    get_all_positions. Startup benchmarks time the command line tools in new
+    processes and check that they do not import pygame or PIL. Everything is
+    written as JSON, --compare prints the time ratios against an earlier run.
+
+    --startup runs only the startup benchmarks, the exit code is 1 if a tool
+    imports pygame or PIL, or (with --compare) starts much slower than before.
+
+    Usage: python benchmark.py [-o benchmark.json] [-s 2,2:20,20 | -s 3,3,4,4,...]
+           [-m constructive,optimal,pdb,perfect,anytime] [-n boards] [--seed S] [--no-micro] [--startup]
+           [--compare old.json]
+'''
+
+import functools
+import json
+import math
+import numpy as np
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+from getopt import getopt
+from sys import argv
+from puzzle import generate_puzzles, is_solvable
+from solver import SOLVERS, SUPPORTS
+
+
+DEFAULT_OUTPUT = 'benchmark.json'
+DEFAULT_SIZES = [(n, n) for n in range(2, 21)]
+DEFAULT_BOARDS = 10
+DEFAULT_SEED = 2024
+# The optimal methods are only run up to this many cells, also on the sizes given with -s:
+# a hard random 4x4 board takes the pdb method more than a minute
+MAX_CELLS = {'optimal': 9, 'pdb': 12, 'perfect': 9}
+# s, the budget of the methods that run until their time budget, they are not run by default
+BUDGETS = {'anytime': 0.2}
+DEFAULT_METHODS = [method for method in SOLVERS if method not in BUDGETS]
+MICRO_SIZES = [(4, 4), (10, 10), (20, 20)]
+# Every micro benchmark is timed this many times, the best is kept
+MICRO_REPEAT = 5
+# Every command is started this many times, the best is kept
+STARTUP_REPEAT = 5
+# The tools never import these, only the window does
+GUI_MODULES = ('pygame', 'PIL')
+# A startup slower than the earlier run by both of these is a regression
+STARTUP_TOLERANCE = 1.25
+STARTUP_NOISE = 0.02  # s
+
+
+def parse_sizes(text) -> list:
+    '''
+        '2,2:20,20' is every square size from 2x2 to 20x20, '3,3,4,5' is 3x3 and 4x5
+    '''
+    if ':' in text:
+        (low, _), (high, _) = (map(int, part.split(',')) for part in text.split(':'))
+        return [(n, n) for n in range(low, high + 1)]
+    numbers = list(map(int, text.split(',')))
+    return list(zip(numbers[::2], numbers[1::2]))
+
+
+def measure_peak(solve, board) -> int:
+    '''
+        returns the peak memory of one solve in bytes
+    '''
+    tracemalloc.start()
+    try:
+        solve(board)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_solver(method, rows, cols, count, seed) -> dict:
+    boards = generate_puzzles(count, rows, cols, seed=seed).astype(int)
+    if method in BUDGETS:
+        solve = functools.partial(SOLVERS[method], time_budget=BUDGETS[method])
+    else:
+        solve = SOLVERS[method]
+    seconds, lengths = [], []
+    for board in boards:
+        start = time.perf_counter()
+        moves = solve(board)
+        seconds.append(time.perf_counter() - start)
+        lengths.append(len(moves))
+
+    total = sum(seconds)
+    return {
+        'method': method, 'rows': rows, 'cols': cols, 'boards': count,
+        'time_budget': BUDGETS.get(method),  # the time of a budgeted method is mostly its budget
+        'seconds': total,
+        'mean_seconds': total / count,
+        'median_seconds': float(np.median(seconds)),
+        'max_seconds': max(seconds),
+        'mean_moves': sum(lengths) / count,
+        'max_moves': max(lengths),
+        'moves_per_second': sum(lengths) / total if total else None,
+        'peak_bytes': measure_peak(solve, boards[0]),
+    }
+
+
+def scaling_exponent(results) -> dict:
+    '''
+        The slope of log(mean time) against log(cells), per method
+    '''
+    exponents = {}
+    for method in dict.fromkeys(result['method'] for result in results if result['method'] not in BUDGETS):
+        points = [(math.log(result['rows'] * result['cols']), math.log(result['mean_seconds']))
+                  for result in results if result['method'] == method and result['mean_seconds'] > 0]
+        if len(points) >= 2:
+            exponents[method] = float(np.polyfit(*zip(*points), 1)[0])
+    return exponents
+
+
+def time_call(function) -> float:
+    '''
+        returns the best time of one call in seconds
+    '''
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(MICRO_REPEAT, number)) / number
+
+
+def bench_micro(sizes, seed) -> list:
+    import game
+
+    results = []
+    for rows, cols in sizes:
+        board = generate_puzzles(1, rows, cols, seed=seed)[0].astype(int)
+        game.NUM_OF_ROWS, game.NUM_OF_COLS = rows, cols
+        game.BLANK = rows * cols - 1
+        for name, function in (
+                ('is_solvable', lambda: is_solvable(board)),
+                ('generate_new_puzzle', game.generate_new_puzzle),
+                ('get_all_positions', lambda: game.get_all_positions(board))):
+            results.append({'function': name, 'rows': rows, 'cols': cols,
+                            'seconds': time_call(function)})
+    return results
+
+
+def startup_commands(directory) -> dict:
+    '''
+        The arguments of python for every command, python and numpy alone are the floor
+    '''
+    solution = os.path.join(directory, 'solution.slv')
+    return {
+        'python': ['-c', 'pass'],
+        'import numpy': ['-c', 'import numpy'],
+        'cli validate': ['cli.py', 'validate', 'solvable_board.csv'],
+        'cli solve': ['cli.py', 'solve', '--no-cache', '-o', solution, 'solvable_board.csv'],
+        'cli generate': ['cli.py', 'generate', '-d', '4,4', '-o', os.path.join(directory, 'boards.brd')],
+        'game --headless': ['game.py', '--headless', '--no-cache', '-b', 'solvable_board.csv',
+                            '-o', solution],
+    }
+
+
+def bench_startup() -> list:
+    '''
+        Starts every command STARTUP_REPEAT times, and once with -X importtime
+        to find the GUI modules it imports
+    '''
+    here = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for name, args in startup_commands(directory).items():
+            imports = subprocess.run([sys.executable, '-X', 'importtime', *args], cwd=here,
+                                     capture_output=True, text=True).stderr
+            modules = {line.split('|')[-1].strip().split('.')[0]
+                       for line in imports.splitlines() if line.startswith('import time:')}
+            seconds = []
+            for _ in range(STARTUP_REPEAT):
+                start = time.perf_counter()
+                subprocess.run([sys.executable, *args], cwd=here, capture_output=True, check=True)
+                seconds.append(time.perf_counter() - start)
+            results.append({'command': name, 'seconds': min(seconds),
+                            'gui_imports': [module for module in GUI_MODULES if module in modules]})
+    return results
+
+
+def startup_regressions(new, old=None) -> list:
+    '''
+        returns the problems of the startup benchmarks, as text
+    '''
+    before = {result['command']: result['seconds'] for result in (old or {}).get('startup', [])}
+    problems = []
+    for result in new.get('startup', []):
+        if result['gui_imports']:
+            problems.append(f'{result["command"]} imports {", ".join(result["gui_imports"])}')
+        seconds, old_seconds = result['seconds'], before.get(result['command'])
+        if old_seconds and seconds > old_seconds * STARTUP_TOLERANCE and seconds > old_seconds + STARTUP_NOISE:
+            problems.append(f'{result["command"]} starts in {seconds * 1000:.0f} ms '
+                            f'instead of {old_seconds * 1000:.0f} ms')
+    return problems
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'python': platform.python_version(), 'numpy': np.__version__,
+            'machine': platform.machine(), 'platform': platform.platform(),
+            'commit': commit, 'date': time.strftime('%Y-%m-%d %H:%M:%S')}
+
+
+def compare(old, new):
+    '''
+        Prints new time / old time for every entry in both runs
+    '''
+    def entries(report):
+        for result in report['solvers']:
+            yield (result['method'], result['rows'], result['cols']), result['mean_seconds']
+        for result in report.get('micro', []):
+            yield (result['function'], result['rows'], result['cols']), result['seconds']
+
+    before = dict(entries(old))
+    for (name, rows, cols), seconds in entries(new):
+        if before.get((name, rows, cols)):
+            print(f'{name:20} {rows:>2}x{cols:<2} {seconds / before[(name, rows, cols)]:6.2f}x')
+    before = {result['command']: result['seconds'] for result in old.get('startup', [])}
+    for result in new.get('startup', []):
+        if before.get(result['command']):
+            print(f'{result["command"]:26} {result["seconds"] / before[result["command"]]:6.2f}x')
+
+
+def main():
+    output = DEFAULT_OUTPUT
+    sizes = DEFAULT_SIZES
+    methods = DEFAULT_METHODS
+    count = DEFAULT_BOARDS
+    seed = DEFAULT_SEED
+    micro = True
+    startup_only = False
+    baseline = None
+    opts, _ = getopt(argv[1:], "o:s:m:n:", [
+                     "output=", "sizes=", "methods=", "boards=", "seed=", "no-micro", "startup",
+                     "compare="])
+    for opt, val in opts:
+        if opt in ("--output", "-o"):
+            output = val
+        elif opt in ("--sizes", "-s"):
+            sizes = parse_sizes(val)
+        elif opt in ("--methods", "-m"):
+            methods = val.split(',')
+            unknown = [method for method in methods if method not in SOLVERS]
+            if unknown:
+                sys.exit(f'Unknown method: {", ".join(unknown)}, choose from {", ".join(SOLVERS)}')
+        elif opt in ("--boards", "-n"):
+            count = int(val)
+        elif opt == "--seed":
+            seed = int(val)
+        elif opt == "--no-micro":
+            micro = False
+        elif opt == "--startup":
+            startup_only = True
+        elif opt == "--compare":
+            baseline = val
+
+    results = []
+    for method in [] if startup_only else methods:
+        for rows, cols in sizes:
+            if rows * cols > MAX_CELLS.get(method, math.inf):
+                if sizes is not DEFAULT_SIZES:
+                    print(f'{method:12} {rows:>2}x{cols:<2} skipped, above {MAX_CELLS[method]} cells')
+                continue
+            if method in SUPPORTS and not SUPPORTS[method](rows, cols):
+                print(f'{method:12} {rows:>2}x{cols:<2} skipped, the method does not solve this size')
+                continue
+            result = bench_solver(method, rows, cols, count, seed)
+            results.append(result)
+            print(f'{method:12} {rows:>2}x{cols:<2} {result["mean_seconds"]:9.4f} s '
+                  f'{result["mean_moves"]:9.1f} moves {result["peak_bytes"] / 1024:9.0f} KiB')
+
+    report = {'environment': environment(), 'seed': seed, 'boards': count,
+              'solvers': results, 'scaling': scaling_exponent(results)}
+    if micro and not startup_only:
+        report['micro'] = bench_micro(MICRO_SIZES, seed)
+        for result in report['micro']:
+            print(f'{result["function"]:20} {result["rows"]:>2}x{result["cols"]:<2} '
+                  f'{result["seconds"] * 1e6:9.1f} us')
+
+    report['startup'] = bench_startup()
+    for result in report['startup']:
+        print(f'{result["command"]:26} {result["seconds"] * 1000:9.1f} ms'
+              + (f' imports {", ".join(result["gui_imports"])}' if result['gui_imports'] else ''))
+
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'Results in {output}')
+
+    old = None
+    if baseline:
+        with open(baseline) as f:
+            old = json.load(f)
+        compare(old, report)
+    if startup_only:
+        problems = startup_regressions(report, old)
+        for problem in problems:
+            print(f'Startup regression: {problem}')
+        return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
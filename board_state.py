@@ -0,0 +1,173 @@
+'''
+    Compact board state for the solvers
+
+    Moves are small integers, MOVES[i] is the name used by the game. The inverse
+    of move i is i ^ 1. For every board size the transition tables tell, for each
+    BLANK cell and move, which cell the BLANK goes to, so making or undoing a move
+    is two table lookups and two swaps, without creating objects.
+'''
+
+from array import array
+from functools import lru_cache
+from itertools import product
+
+
+MOVES = ('left', 'right', 'up', 'down')
+LEFT, RIGHT, UP, DOWN = range(4)
+MOVE_CODES = {move: code for code, move in enumerate(MOVES)}
+# Where the BLANK goes for each move (the tile slides the other way)
+OFFSETS = ((0, 1), (0, -1), (1, 0), (-1, 0))
+NO_CELL = -1
+
+# A 4x4 board fits into 64 bits, 4 bits per tile
+PACK_BITS = 4
+PACK_LIMIT = 1 << PACK_BITS
+
+
+def inverse(move) -> int:
+    return move ^ 1
+
+
+def encode_moves(moves) -> list:
+    '''
+        'left', 'up', ... -> 0, 2, ...
+    '''
+    return [MOVE_CODES[move] for move in moves]
+
+
+def decode_moves(codes) -> list:
+    return [MOVES[code] for code in codes]
+
+
+class MoveTables:
+    '''
+        Precomputed transitions of one board size
+        target[cell * 4 + move]: the cell the BLANK goes to from cell, NO_CELL if not valid
+        moves_from[cell]: ((move, target cell), ...) of the valid moves
+    '''
+    __slots__ = ('rows', 'cols', 'target', 'moves_from')
+
+    def __init__(self, rows, cols):
+        self.rows = rows
+        self.cols = cols
+        self.target = array('i', [NO_CELL] * (rows * cols * len(MOVES)))
+        moves_from = []
+        for x, y in product(range(rows), range(cols)):
+            cell = x * cols + y
+            valid = []
+            for move, (d_x, d_y) in enumerate(OFFSETS):
+                if 0 <= x + d_x < rows and 0 <= y + d_y < cols:
+                    self.target[cell * len(MOVES) + move] = (x + d_x) * cols + y + d_y
+                    valid.append((move, (x + d_x) * cols + y + d_y))
+            moves_from.append(tuple(valid))
+        self.moves_from = tuple(moves_from)
+
+
+@lru_cache(maxsize=None)
+def move_tables(rows, cols) -> MoveTables:
+    return MoveTables(rows, cols)
+
+
+class BoardState:
+    '''
+        tiles[cell] is the tile in the cell, cell_of[tile] is the cell of the tile,
+        cells are numbered row by row. The BLANK is the last tile.
+    '''
+    __slots__ = ('rows', 'cols', 'blank', 'tiles', 'cell_of', 'tables')
+
+    def __init__(self, rows, cols, tiles):
+        self.rows = rows
+        self.cols = cols
+        size = rows * cols
+        self.blank = size - 1
+        self.tiles = bytearray(tiles) if size <= 256 else array('H', tiles)
+        self.cell_of = bytearray(size) if size <= 256 else array('H', [0]) * size
+        for cell, tile in enumerate(self.tiles):
+            self.cell_of[tile] = cell
+        self.tables = move_tables(rows, cols)
+
+    @classmethod
+    def from_board(cls, board):
+        '''
+            board: 2D board (numpy array or nested lists)
+        '''
+        return cls(len(board), len(board[0]), [int(tile) for row in board for tile in row])
+
+    @classmethod
+    def solved(cls, rows, cols):
+        return cls(rows, cols, range(rows * cols))
+
+    def copy(self):
+        return BoardState(self.rows, self.cols, self.tiles)
+
+    def to_board(self) -> list:
+        return [list(self.tiles[x * self.cols:(x + 1) * self.cols]) for x in range(self.rows)]
+
+    @property
+    def blank_cell(self) -> int:
+        return self.cell_of[self.blank]
+
+    def coords(self, tile) -> tuple:
+        '''
+            (row, col) of the tile
+        '''
+        return divmod(self.cell_of[tile], self.cols)
+
+    def is_valid(self, move) -> bool:
+        return self.tables.target[self.cell_of[self.blank] * 4 + move] != NO_CELL
+
+    def make(self, move):
+        '''
+            Does not check if the move is valid
+        '''
+        blank_cell = self.cell_of[self.blank]
+        cell = self.tables.target[blank_cell * 4 + move]
+        tile = self.tiles[cell]
+        self.tiles[blank_cell] = tile
+        self.tiles[cell] = self.blank
+        self.cell_of[tile] = blank_cell
+        self.cell_of[self.blank] = cell
+
+    def undo(self, move):
+        self.make(move ^ 1)
+
+    def is_solved(self) -> bool:
+        return all(tile == cell for cell, tile in enumerate(self.tiles))
+
+    def key(self) -> bytes:
+        '''
+            Hashable copy of the tiles
+        '''
+        return bytes(self.tiles)
+
+    def pack(self) -> int:
+        return pack(self.tiles)
+
+
+def pack(tiles) -> int:
+    '''
+        Packs a board of at most 16 cells into one integer, 4 bits per cell
+    '''
+    if len(tiles) > PACK_LIMIT:
+        raise ValueError(f'Only boards of at most {PACK_LIMIT} cells can be packed')
+    packed = 0
+    for cell, tile in enumerate(tiles):
+        packed |= tile << (PACK_BITS * cell)
+    return packed
+
+
+def unpack(packed, size) -> list:
+    return [(packed >> (PACK_BITS * cell)) & (PACK_LIMIT - 1) for cell in range(size)]
+
+
+def make_packed(packed, blank_cell, move, tables):
+    '''
+        Makes a move on a packed board
+        returns the new packed board and BLANK cell
+    '''
+    cell = tables.target[blank_cell * 4 + move]
+    blank = tables.rows * tables.cols - 1
+    # The tile and the BLANK swap: xor both cells with (tile ^ BLANK)
+    difference = ((packed >> (PACK_BITS * cell)) & (PACK_LIMIT - 1)) ^ blank
+    packed ^= (difference << (PACK_BITS * cell)) | (difference << (PACK_BITS * blank_cell))
+    return packed, cell
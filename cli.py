@@ -0,0 +1,106 @@
+'''
+    Command line tools without the window
+
+    Neither pygame nor PIL is imported here, and every command imports only
+    the modules it needs, so they start as fast as numpy allows.
+
+    Usage: python cli.py solve board.csv [-o solution.slv] [-m method] [--time-budget S] [--no-cache]
+               solves a board like game.py --headless
+           python cli.py validate board.csv|boards.brd ...
+               checks the boards, the exit code is 1 if one is not valid
+           python cli.py generate -d rows,cols -n count -o directory_or.brd [--seed S] ...
+               the same as puzzle.py
+           python cli.py verify [-b board.csv] [--results results.jsonl] solution.slv ...
+               the same as verify.py
+'''
+
+import sys
+from getopt import gnu_getopt
+from sys import argv
+
+
+def solve(args) -> int:
+    import numpy as np
+    from anytime import DEFAULT_TIME_BUDGET
+    from game import DEFAULT_METHOD, SMALL_BOARD_METHOD, SOLUTION_FILE, solve_headless
+    from perfect_table import supports
+    from puzzle import validate_boards
+    from solution_cache import SolutionCache
+    from solver import SOLVERS
+
+    solution_file = SOLUTION_FILE
+    method = None
+    time_budget = DEFAULT_TIME_BUDGET
+    use_cache = True
+    opts, files = gnu_getopt(args, "o:m:", ["output=", "method=", "time-budget=", "no-cache"])
+    for opt, val in opts:
+        if opt in ("--output", "-o"):
+            solution_file = val
+        elif opt in ("--method", "-m"):
+            if val not in SOLVERS:
+                sys.exit(f'Unknown method: {val}, choose from {", ".join(SOLVERS)}')
+            method = val
+        elif opt == "--time-budget":
+            time_budget = float(val)
+            method = method or 'anytime'
+        elif opt == "--no-cache":
+            use_cache = False
+    if len(files) != 1:
+        sys.exit('Give one board file')
+
+    board = np.genfromtxt(files[0], delimiter=',', dtype=int, ndmin=2)
+    try:
+        validate_boards(board)
+    except ValueError as error:
+        sys.exit(f'{files[0]}: {error}')
+    if method is None:
+        method = SMALL_BOARD_METHOD if supports(*board.shape) else DEFAULT_METHOD
+    cache = SolutionCache() if use_cache else None
+    return solve_headless(board, solution_file, method, time_budget, cache)
+
+
+def validate(files) -> int:
+    import numpy as np
+    from dataset import is_dataset, open_dataset, solvable_count
+    from puzzle import is_solvable, validate_boards
+
+    failed = 0
+    for path in files:
+        try:
+            if is_dataset(path):
+                boards = open_dataset(path)
+                print(f'{path}: {len(boards)} boards of {boards.shape[1]}x{boards.shape[2]}, '
+                      f'{solvable_count(boards)} solvable')
+            else:
+                board = np.genfromtxt(path, delimiter=',', dtype=int, ndmin=2)
+                validate_boards(board)
+                print(f'{path}: {board.shape[0]}x{board.shape[1]}, '
+                      f'{"solvable" if is_solvable(board, validate=False) else "not solvable"}')
+        except (OSError, ValueError) as error:
+            print(f'{path}: {error}')
+            failed += 1
+    return 1 if failed else 0
+
+
+def generate(args) -> int:
+    from puzzle import main
+    main(args)
+    return 0
+
+
+def verify(args) -> int:
+    from verify import main
+    return main(args)
+
+
+COMMANDS = {'solve': solve, 'validate': validate, 'generate': generate, 'verify': verify}
+
+
+def main():
+    if len(argv) < 2 or argv[1] not in COMMANDS:
+        sys.exit(__doc__)
+    return COMMANDS[argv[1]](argv[2:])
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,190 @@
+'''
+    Board datasets
+
+    Many boards of the same size in one binary file (little endian):
+        b'BRD1', rows (uint16), cols (uint16), number of boards (uint64),
+        the boards one after the other, row by row (uint8, or uint16 above 256 cells).
+    The boards are read through np.memmap, so any range of them is a slice
+    of the file without reading the rest.
+
+    Usage: python dataset.py -o boards.brd directory_or_csv_or_glob ...
+               converts board csv files (the format of solvable_board.csv) into a dataset
+           python dataset.py --info boards.brd
+               checks every board of a dataset
+'''
+
+import glob
+import numpy as np
+import os
+import struct
+import sys
+from getopt import getopt
+from sys import argv
+from puzzle import board_dtype, invalid_boards, is_solvable, validate_boards
+
+
+MAGIC = b'BRD1'
+HEADER = struct.Struct('<4sHHQ')
+COUNT_OFFSET = 8
+# Boards checked or converted at once
+CHUNK = 1 << 16
+
+
+def find_boards(sources) -> list:
+    '''
+        Directories give all their csv files, anything else is a glob pattern
+    '''
+    files = []
+    for source in sources:
+        if os.path.isdir(source):
+            files.extend(sorted(glob.glob(os.path.join(source, '*.csv'))))
+        else:
+            files.extend(sorted(glob.glob(source)))
+    return files
+
+
+class DatasetWriter:
+    '''
+        with DatasetWriter(path, rows, cols) as writer:
+            writer.write(boards)
+        boards: one board or a (K, rows, cols) stack
+    '''
+
+    def __init__(self, path, rows, cols):
+        self.rows, self.cols = rows, cols
+        self.dtype = np.dtype(board_dtype(rows, cols)).newbyteorder('<')
+        self.file = open(path, 'wb')
+        self.count = 0
+        self.file.write(HEADER.pack(MAGIC, rows, cols, 0))
+
+    def write(self, boards):
+        boards = np.asarray(boards)
+        if boards.shape[-2:] != (self.rows, self.cols):
+            raise ValueError(f'Expected {self.rows}x{self.cols} boards, got shape {boards.shape}')
+        self.file.write(boards.astype(self.dtype).tobytes())
+        self.count += boards.size // (self.rows * self.cols)
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.file.seek(COUNT_OFFSET)
+        self.file.write(struct.pack('<Q', self.count))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def write_dataset(path, boards):
+    boards = np.asarray(boards)
+    with DatasetWriter(path, *boards.shape[-2:]) as writer:
+        writer.write(boards)
+
+
+def is_dataset(path) -> bool:
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def read_header(path):
+    '''
+        returns rows, cols, number of boards
+    '''
+    with open(path, 'rb') as f:
+        data = f.read(HEADER.size)
+    if len(data) < HEADER.size:
+        raise ValueError(f'{path} is not a board dataset, it is shorter than the header')
+    magic, rows, cols, count = HEADER.unpack(data)
+    if magic != MAGIC:
+        raise ValueError(f'{path} is not a board dataset')
+    return rows, cols, count
+
+
+def open_dataset(path, validate=True):
+    '''
+        returns the boards as a read-only (count, rows, cols) memmap
+        validate: check that every board is a permutation, chunk by chunk,
+            raises ValueError with the index of the first bad board
+    '''
+    rows, cols, count = read_header(path)
+    dtype = np.dtype(board_dtype(rows, cols)).newbyteorder('<')
+    expected = HEADER.size + count * rows * cols * dtype.itemsize
+    if os.path.getsize(path) < expected:
+        raise ValueError(f'{path} is shorter than its {count} boards')
+    if not count:
+        return np.empty((0, rows, cols), dtype=dtype)
+    boards = np.memmap(path, dtype=dtype, mode='r', offset=HEADER.size, shape=(count, rows, cols))
+    if validate:
+        for start in range(0, count, CHUNK):
+            bad = invalid_boards(boards[start:start + CHUNK].reshape(-1, rows * cols))
+            if bad.size:
+                raise ValueError(f'{path}: board {start + bad[0]} is not a permutation of 0..{rows * cols - 1}')
+    return boards
+
+
+def solvable_count(boards) -> int:
+    return sum(int(np.count_nonzero(is_solvable(boards[start:start + CHUNK], validate=False)))
+               for start in range(0, len(boards), CHUNK))
+
+
+def convert_csv(sources, path) -> int:
+    '''
+        Writes the boards of the csv files (directories, files or glob patterns) into a dataset,
+        all boards have to be the same size
+        returns the number of boards
+    '''
+    files = find_boards(sources)
+    if not files:
+        raise ValueError('No board files found')
+    writer = None
+    try:
+        for start in range(0, len(files), CHUNK):
+            chunk = files[start:start + CHUNK]
+            boards = [np.genfromtxt(file, delimiter=',', dtype=int, ndmin=2) for file in chunk]
+            for file, board in zip(chunk, boards):
+                if board.shape != boards[0].shape:
+                    raise ValueError(f'{file} is not {boards[0].shape[0]}x{boards[0].shape[1]} '
+                                     f'like {chunk[0]}')
+            boards = np.array(boards)
+            validate_boards(boards)
+            if writer is None:
+                writer = DatasetWriter(path, *boards.shape[-2:])
+            writer.write(boards)
+    except ValueError:
+        if writer is not None:
+            writer.close()
+            os.remove(path)
+        raise
+    writer.close()
+    return writer.count
+
+
+def main():
+    output = None
+    info = None
+    opts, sources = getopt(argv[1:], "o:", ["output=", "info="])
+    for opt, val in opts:
+        if opt in ("--output", "-o"):
+            output = val
+        elif opt == "--info":
+            info = val
+
+    try:
+        if info:
+            boards = open_dataset(info)
+            print(f'{info}: {len(boards)} boards of {boards.shape[1]}x{boards.shape[2]}, '
+                  f'{solvable_count(boards)} solvable')
+        elif output:
+            count = convert_csv(sources, output)
+            print(f'{count} boards written to {output}')
+        else:
+            sys.exit('The output (-o) or --info is required')
+    except ValueError as error:
+        sys.exit(str(error))
+
+
+if __name__ == '__main__':
+    main()
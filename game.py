@@ -2,14 +2,25 @@
     Slide Puzzle
 '''
 
-import pygame
 import numpy as np
 import sys
-from PIL import Image
-from sympy.combinatorics.permutations import Permutation
+import math
+import time
+import os
+import hashlib
+import profiler
 from itertools import product
 from sys import argv
 from getopt import getopt
+from solver import SOLVERS, estimate_length, iter_solution, methods_for
+from solve_worker import SolveWorker, MOVES, DONE, CANCELLED, ERROR
+from puzzle import generate_puzzles, is_solvable, validate_boards
+from board_state import BoardState, decode_moves
+from history import MoveHistory
+from perfect_table import supports
+from anytime import DEFAULT_TIME_BUDGET
+from solution_cache import SolutionCache
+from solution_io import SolutionWriter, is_legacy, iter_move_chunks, read_board, write_solution
 
 
 # These may change during initialization
@@ -18,12 +29,21 @@ NUM_OF_ROWS = 4
 BLANK = NUM_OF_COLS * NUM_OF_ROWS - 1
 
 # Create the constants
-TILESIZE = 80
+MAX_TILESIZE = 80
+TILESIZE = MAX_TILESIZE
 WINDOWWIDTH = 1280
 WINDOWHEIGHT = 720
+# Larger boards get smaller tiles, the board stays left of the buttons and below the message
+BOARD_WIDTH = WINDOWWIDTH - 2 * 240
+BOARD_HEIGHT = WINDOWHEIGHT - 2 * 40
 XMARGIN = (WINDOWWIDTH - (TILESIZE * NUM_OF_COLS + (NUM_OF_COLS + 1))) // 2
 YMARGIN = (WINDOWHEIGHT - (TILESIZE * NUM_OF_ROWS + (NUM_OF_ROWS + 1))) // 2
 FPS = 60
+MOVE_TIME = 0.15  # s, the animation of one move
+RESET_FADE = 0.2  # s, Reset fades to the start board
+PLAYBACK_DURATION = 20  # s, the longest a solution is animated
+IDLE_TIMEOUT = 1000  # ms, the main loop sleeps at most this long without events
+SOLVING_TIMEOUT = 100  # ms, the same while a solve runs in the background, for the progress
 BASICFONTSIZE = 20
 
 # Colors
@@ -42,6 +62,30 @@ BUTTONCOLOR = SAND
 BUTTONTEXTCOLOR = BLACK
 MESSAGECOLOR = BLACK
 DEFAULT_IMAGE = "dino.gif"
+SOLUTION_FILE = "solution.slv"
+DEFAULT_METHOD = 'constructive'
+# Small boards are solved optimally from a table by default, see perfect_table.py
+SMALL_BOARD_METHOD = 'perfect'
+# s, the choices of the Budget button of the anytime method
+TIME_BUDGETS = (0.5, 1, 2, 5, 10, 30)
+# From this many cells the constructive solution is played and written while it is found
+STREAM_CELLS = 2500
+
+# Tile atlases of the images, see process_image
+ATLAS_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.tile_cache')
+ATLAS_CACHE = {}
+
+# Rendered surfaces, see get_tile_surf and get_message_surf
+TILE_CACHE = {}
+MESSAGE_CACHE = {}
+
+# The background solve, see solve_worker.py
+WORKER = None
+
+# Imported by load_gui only when a window is opened, they take most of the startup time,
+# --headless and the modules using game's functions do not need them
+pygame = None
+Image = None
 
 
 def main():
@@ -49,42 +93,52 @@ def main():
         Initialization based on the constants
     '''
     global msg, show_image, show_number, \
-        FPSCLOCK, DISPLAYSURF, BASICFONT, IMAGES, NUM_OF_ROWS, NUM_OF_COLS, BLANK, XMARGIN, YMARGIN,\
-        RESET_SURF, RESET_RECT, NEW_SURF, NEW_RECT, SOLVE_SURF, SOLVE_RECT
+        FPSCLOCK, DISPLAYSURF, BASICFONT, IMAGES, NUM_OF_ROWS, NUM_OF_COLS, BLANK, TILESIZE, XMARGIN, YMARGIN,\
+        RESET_SURF, RESET_RECT, NEW_SURF, NEW_RECT, SOLVE_SURF, SOLVE_RECT, METHOD_SURF, METHOD_RECT, \
+        BUDGET_SURF, BUDGET_RECT, WORKER
 
-    # Initialization for the game
-    pygame.init()
-    FPSCLOCK = pygame.time.Clock()
-    DISPLAYSURF = pygame.display.set_mode((WINDOWWIDTH, WINDOWHEIGHT))
-    pygame.display.set_caption('Slide Puzzle')
-    BASICFONT = pygame.font.Font('freesansbold.ttf', BASICFONTSIZE)
     show_image = False
     show_number = False
-
-    # Buttons
-    RESET_SURF, RESET_RECT = make_text(
-        'Reset', TEXTCOLOR, BUTTONCOLOR, WINDOWWIDTH - 120, WINDOWHEIGHT - 90)
-    NEW_SURF,   NEW_RECT = make_text(
-        'New Game', TEXTCOLOR, BUTTONCOLOR, WINDOWWIDTH - 120, WINDOWHEIGHT - 60)
-    SOLVE_SURF, SOLVE_RECT = make_text(
-        'Solve',    TEXTCOLOR, BUTTONCOLOR, WINDOWWIDTH - 120, WINDOWHEIGHT - 30)
+    headless = False
+    solution_file = SOLUTION_FILE
+    method = None
+    time_budget = DEFAULT_TIME_BUDGET
+    use_cache = True
+    playback = PLAYBACK_DURATION
+    replay_file = None
 
     board = None
     image_source = DEFAULT_IMAGE
 
     # check for command line arguments:
     arg = argv[1:]
-    opts, _ = getopt(arg, "b:d:i:s:n:", [
-                     "board=", "dimensions=", "image=", "source=", "shownumber="])
+    opts, _ = getopt(arg, "b:d:i:s:n:o:m:p:", [
+                     "board=", "dimensions=", "image=", "source=", "shownumber=",
+                     "output=", "method=", "playback=", "headless", "replay=", "profile=",
+                     "time-budget=", "no-cache"])
     for opt, val in opts:
         # Make the game board
         if opt in ("--board", "-b"):
             board = np.genfromtxt(val, delimiter=',', dtype=int)
+            try:
+                validate_boards(board)
+            except ValueError as error:
+                sys.exit(f'{val}: {error}')
             NUM_OF_ROWS, NUM_OF_COLS = np.shape(board)
+        elif opt == "--replay":
+            # files in the new format start from their own board
+            replay_file = val
+            try:
+                if not is_legacy(val):
+                    board = np.array(read_board(val)[0])
+                    NUM_OF_ROWS, NUM_OF_COLS = np.shape(board)
+            except (OSError, ValueError) as error:
+                sys.exit(f'{val}: {error}')
         elif opt in ("--dimensions", "-d") and board is None:
             NUM_OF_ROWS, NUM_OF_COLS = tuple(map(int, val.split(',')))
 
         BLANK = NUM_OF_COLS * NUM_OF_ROWS - 1
+        TILESIZE = tile_size(NUM_OF_ROWS, NUM_OF_COLS)
         XMARGIN = (WINDOWWIDTH - (TILESIZE *
                    NUM_OF_COLS + (NUM_OF_COLS + 1))) // 2
         YMARGIN = (WINDOWHEIGHT - (TILESIZE *
@@ -100,34 +154,132 @@ def main():
         if opt in ("--shownumber", "-n"):
             show_number = True if val == 'True' else False
 
+        if opt in ("--output", "-o"):
+            solution_file = val
+
+        if opt in ("--method", "-m"):
+            if val not in SOLVERS:
+                sys.exit(f'Unknown method: {val}, choose from {", ".join(SOLVERS)}')
+            method = val
+
+        if opt in ("--playback", "-p"):
+            playback = float(val)
+
+        if opt == "--headless":
+            headless = True
+
+        if opt == "--profile":
+            profiler.enable(val)
+
+        if opt == "--time-budget":
+            time_budget = float(val)
+            method = method or 'anytime'
+
+        if opt == "--no-cache":
+            use_cache = False
+
     if board is None:
         board = generate_new_puzzle()
+    if method is None:
+        method = SMALL_BOARD_METHOD if supports(NUM_OF_ROWS, NUM_OF_COLS) else DEFAULT_METHOD
+
+    cache = SolutionCache() if use_cache else None
+
+    if headless:
+        sys.exit(solve_headless(board, solution_file, method, time_budget, cache))
+
+    # Initialization for the game
+    load_gui()
+    pygame.init()
+    FPSCLOCK = pygame.time.Clock()
+    DISPLAYSURF = pygame.display.set_mode((WINDOWWIDTH, WINDOWHEIGHT))
+    pygame.display.set_caption('Slide Puzzle')
+    BASICFONT = pygame.font.Font('freesansbold.ttf', BASICFONTSIZE)
+    if profiler.PROFILER:
+        profiler.instrument_game(sys.modules[__name__], pygame.display)
+
+    # Buttons
+    RESET_SURF, RESET_RECT = make_text(
+        'Reset', TEXTCOLOR, BUTTONCOLOR, WINDOWWIDTH - 120, WINDOWHEIGHT - 90)
+    NEW_SURF,   NEW_RECT = make_text(
+        'New Game', TEXTCOLOR, BUTTONCOLOR, WINDOWWIDTH - 120, WINDOWHEIGHT - 60)
+    SOLVE_SURF, SOLVE_RECT = make_solve_button(False)
+    METHOD_SURF, METHOD_RECT = make_method_button(method)
+    BUDGET_SURF, BUDGET_RECT = make_budget_button(time_budget)
 
     # we need to know the dimensions first for IMAGE
     IMAGES = process_image(image_source)
+    TILE_CACHE.clear()
 
     position = get_all_positions(board)
-    moves = []
+    history = MoveHistory(board)
     msg = 'Click tile or press arrow keys to slide.'
-    solvable = if_solvable(board, position)
+    solve_note = ''  # the length and the bound of the last anytime solve
+    solvable = is_solvable(board, validate=False)
     if not solvable:
         msg = 'This board is not solvable! Click tile or press arrow keys to slide.'
 
-    SOLVEDBOARD = np.arange(
-        NUM_OF_COLS * NUM_OF_ROWS).reshape(NUM_OF_ROWS, NUM_OF_COLS)
-    run = True
-
-    while run:    # Main game loop
-        slide_to = None  # The direction a tile should slide
-
-        if np.all(board == SOLVEDBOARD):
-            msg = 'Congratulations!'
+    misplaced = count_misplaced(board)
+    redraw_all = True  # The whole frame has to be drawn again
+    dirty_rects = []  # Only these parts of the frame changed
+    stream_move_time = MOVE_TIME  # of the moves played while a large board is solved, set by Solve
 
+    if replay_file:
         draw_board(board)
+        pygame.display.update()
+        replayed, error = replay_solution(board, position, replay_file, playback)
+        history.extend(replayed)
+        misplaced = count_misplaced(board)
+        if error:
+            msg = error
+
+    while True:    # Main game loop
+        slide_to = None  # The direction a tile should slide
 
-        for event in pygame.event.get():  # Event loop
+        if WORKER:  # Moves and news of the background solve, one message per loop, so Esc works between them
+            kind, data = WORKER.message()
+            if kind == MOVES and WORKER.stream:
+                history.extend(play_moves(board, position, data, stream_move_time))
+            elif kind == MOVES:
+                history.extend(do_movelist(board, position, data, duration=playback))
+            elif kind == ERROR:
+                msg = f'The solver failed: {data}'
+            if kind == DONE and 'report' in WORKER.options:
+                solve_note = ' ' + describe_report(WORKER.options['report'])
+            if kind in (DONE, CANCELLED, ERROR):
+                WORKER = None
+                SOLVE_SURF, SOLVE_RECT = make_solve_button(False)
+                redraw_all = True
+            misplaced = count_misplaced(board)
+            if WORKER:
+                msg = f'Solving ({method})... {WORKER.elapsed:.1f} s' + \
+                    (f', {WORKER.moves_found} moves' if WORKER.moves_found else '') + \
+                    ' Press Esc or Cancel to stop.'
+
+        if misplaced == 0:
+            msg = 'Congratulations!' + solve_note
+        elif msg.startswith('Congratulations!'):  # left the solved board by undo or Reset
+            msg = 'Click tile or press arrow keys to slide.'
+            solve_note = ''
+
+        if redraw_all:
+            draw_board(board)
+            pygame.display.update()
+        else:
+            if msg != MESSAGE_CACHE.get('msg'):
+                dirty_rects.append(draw_message())
+            if dirty_rects:
+                pygame.display.update(dirty_rects)
+        redraw_all = False
+        dirty_rects = []
+
+        # Sleep until something happens
+        if WORKER and not WORKER.queue.empty():  # more moves are waiting, do not sleep
+            events = pygame.event.get()
+        else:
+            events = [pygame.event.wait(SOLVING_TIMEOUT if WORKER else IDLE_TIMEOUT)] + pygame.event.get()
+        for event in events:  # Event loop
             if event.type == pygame.QUIT:
-                run = False
                 pygame.quit()
                 sys.exit()
 
@@ -136,28 +288,51 @@ def main():
                     board, event.pos[0], event.pos[1])
 
                 if (tile_x, tile_y) == (None, None):  # If the user clicked on a button
+                    redraw_all = True
+
+                    if SOLVE_RECT.collidepoint(event.pos) and WORKER:  # Cancel button
+                        cancel_solve()
+                        msg = 'Solving cancelled.'
 
-                    if RESET_RECT.collidepoint(event.pos):  # Reset button
-                        moves = reverse_moves(moves)
-                        do_movelist(board, position, moves, animation_speed=24)
-                        moves.clear()
+                    elif RESET_RECT.collidepoint(event.pos):  # Reset button
+                        cancel_solve()
+                        # back to the start at once, the moves can be redone
+                        board[...] = history.jump(0)
+                        position = get_all_positions(board)
+                        crossfade(board)
 
                     elif NEW_RECT.collidepoint(event.pos):  # New game button
+                        cancel_solve()
                         board = generate_new_puzzle()
                         position = get_all_positions(board)
                         msg = 'Click tile or press arrow keys to slide.'
                         solvable = True
-                        moves.clear()
+                        history = MoveHistory(board)
 
-                    elif SOLVE_RECT.collidepoint(event.pos):  # Solve button
-                        if solvable and not np.all(board == SOLVEDBOARD):
-                            moves.extend(solve_board(
-                                board, position, SOLVEDBOARD))
+                    elif METHOD_RECT.collidepoint(event.pos):  # Switch to the next method for the board size
+                        methods = methods_for(NUM_OF_ROWS, NUM_OF_COLS)
+                        method = methods[(methods.index(method) + 1) % len(methods)] \
+                            if method in methods else methods[0]
+                        METHOD_SURF, METHOD_RECT = make_method_button(method)
 
-                            with open("solution.txt", "w") as f:
-                                f.write(str(moves))
+                    elif BUDGET_RECT.collidepoint(event.pos):  # Switch the time budget of the anytime method
+                        time_budget = min((budget for budget in TIME_BUDGETS if budget > time_budget),
+                                          default=TIME_BUDGETS[0])
+                        BUDGET_SURF, BUDGET_RECT = make_budget_button(time_budget)
 
-                else:  # If the clicked tile was next to the blank spot
+                    elif SOLVE_RECT.collidepoint(event.pos):  # Solve button
+                        if solvable and misplaced:
+                            # large constructive solutions are played while they are found
+                            stream = method == 'constructive' and board.size >= STREAM_CELLS
+                            if stream:
+                                stream_move_time = min(MOVE_TIME, playback / estimate_length(board))
+                            options = {'time_budget': time_budget, 'report': {}} if method == 'anytime' else None
+                            WORKER = SolveWorker(board, method, solution_file, stream, options, cache)
+                            SOLVE_SURF, SOLVE_RECT = make_solve_button(True)
+
+                    misplaced = count_misplaced(board)
+
+                elif not WORKER:  # If the clicked tile was next to the blank spot
                     blank_x, blank_y = position[BLANK]
                     if tile_x == blank_x + 1 and tile_y == blank_y:
                         slide_to = 'up'
@@ -169,7 +344,18 @@ def main():
                         slide_to = 'right'
 
             elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_LEFT and is_valid_move(position, 'left'):
+                if event.key == pygame.K_i:  # Show or hide the image, also while solving
+                    show_image = not show_image
+                    redraw_all = True
+                elif event.key == pygame.K_F3 and profiler.PROFILER:  # Show or hide the profile
+                    profiler.PROFILER.hud = not profiler.PROFILER.hud
+                    redraw_all = True
+                elif WORKER:  # the board is the solver's until it finishes
+                    if event.key == pygame.K_ESCAPE:
+                        cancel_solve()
+                        msg = 'Solving cancelled.'
+                        redraw_all = True
+                elif event.key == pygame.K_LEFT and is_valid_move(position, 'left'):
                     slide_to = 'left'
                 elif event.key == pygame.K_RIGHT and is_valid_move(position, 'right'):
                     slide_to = 'right'
@@ -177,34 +363,102 @@ def main():
                     slide_to = 'up'
                 elif event.key == pygame.K_DOWN and is_valid_move(position, 'down'):
                     slide_to = 'down'
+                elif event.key in (pygame.K_z, pygame.K_y):  # Undo and redo
+                    move = history.undo() if event.key == pygame.K_z else history.redo()
+                    if move:
+                        old_blank = position[BLANK]
+                        make_move(board, position, move)
+                        misplaced += misplaced_change(board, old_blank, position[BLANK])
+                        dirty_rects.extend(draw_cells(board, [old_blank, position[BLANK]]))
 
         if slide_to:
-            moves.append(slide_to)
+            history.record(slide_to)
+            old_blank = position[BLANK]
             make_move(board, position, slide_to)
+            misplaced += misplaced_change(board, old_blank, position[BLANK])
+            dirty_rects.extend(draw_cells(board, [old_blank, position[BLANK]]))
+
+
+def load_gui():
+    global pygame, Image
+    import pygame
+    from PIL import Image
 
-        pygame.display.update()
-        FPSCLOCK.tick(FPS)
+
+def solve_headless(board, solution_file, method=DEFAULT_METHOD, time_budget=DEFAULT_TIME_BUDGET,
+                   cache=None) -> int:
+    '''
+        Solves the board without opening a window, writes the moves to solution_file
+        cache: a SolutionCache asked first
+        returns the exit code
+    '''
+    if not is_solvable(board, validate=False):
+        print('This board is not solvable!', file=sys.stderr)
+        return 1
+
+    report = {}  # filled by the anytime method
+    if method == 'constructive' and board.size >= STREAM_CELLS:
+        with SolutionWriter(solution_file, board) as writer:
+            for chunk in iter_solution(board, names=False):
+                writer.write(chunk)
+        count = writer.count
+    else:
+        options = {'time_budget': time_budget, 'report': report} if method == 'anytime' else {}
+        try:
+            if cache is not None:
+                solution = cache.solve(board, method, **options)
+            else:
+                solution = SOLVERS[method](board, **options)
+        except ValueError as error:  # e.g. a board too big for the perfect method
+            print(error, file=sys.stderr)
+            return 1
+        write_solution(solution_file, board, solution)
+        count = len(solution)
+    print(f'{count} moves written to {solution_file}')
+    if report:
+        print(describe_report(report))
+    return 0
 
 
 def process_image(image_source) -> list:
     '''
         returns a list, i_th element is the picture corresponds to number i
+        The tiles are subsurfaces of one atlas surface, which is cached in memory
+        and on disk by the image's content, TILESIZE and the board size.
+    '''
+    with open(image_source, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    key = f'{digest}_{TILESIZE}_{NUM_OF_ROWS}x{NUM_OF_COLS}'
+
+    atlas = ATLAS_CACHE.get(key)
+    if atlas is None:
+        cache_file = os.path.join(ATLAS_CACHE_DIR, key + '.bmp')
+        if os.path.exists(cache_file):
+            atlas = pygame.image.load(cache_file)
+        else:
+            atlas = make_atlas(image_source)
+            os.makedirs(ATLAS_CACHE_DIR, exist_ok=True)
+            pygame.image.save(atlas, cache_file)
+        ATLAS_CACHE[key] = atlas
+
+    # the atlas is NUM_OF_COLS tiles wide and NUM_OF_ROWS tiles high
+    return [atlas.subsurface((j * TILESIZE, i * TILESIZE, TILESIZE, TILESIZE))
+            for i, j in product(range(NUM_OF_ROWS), range(NUM_OF_COLS))]
+
+
+def make_atlas(image_source):
+    '''
+        Decodes and resizes the image into one surface of the board's size
     '''
     img = Image.open(image_source)
     img = img.rotate(90)
 
     width = NUM_OF_ROWS * TILESIZE
     height = NUM_OF_COLS * TILESIZE
-    img = img.resize((width, height), Image.ANTIALIAS)
+    img = img.resize((width, height), Image.LANCZOS)
 
-    image_array = np.asarray(img)
-    tiles = [image_array[x:x+TILESIZE, y:y+TILESIZE]
-             for x in range(0, image_array.shape[0], TILESIZE) for y in range(0, image_array.shape[1], TILESIZE)]
-    tiles = [pygame.surfarray.make_surface(x) for x in tiles]
-    ordered_tiles = []
-    for i, j in product(list(range(NUM_OF_ROWS)), list(range(NUM_OF_COLS))):
-        ordered_tiles.append(tiles[i+j*NUM_OF_ROWS])
-    return ordered_tiles
+    # surfarray indexes by (x, y), that is why the image was rotated
+    return pygame.surfarray.make_surface(np.asarray(img))
 
 
 def generate_new_puzzle():
@@ -218,12 +472,51 @@ def generate_new_puzzle():
         ]
         where the last element is always the BLANK
     '''
-    perm = Permutation.random(NUM_OF_ROWS * NUM_OF_COLS - 1)
-    while Permutation.parity(perm):
-        perm = Permutation.random(NUM_OF_ROWS * NUM_OF_COLS - 1)
-    perm_list = list(perm)
-    perm_list.append(BLANK)
-    return np.array(perm_list, dtype='int32').reshape(NUM_OF_ROWS, NUM_OF_COLS)
+    return generate_puzzles(1, NUM_OF_ROWS, NUM_OF_COLS)[0].astype('int32')
+
+
+def make_method_button(method):
+    '''
+        The button shows the current solving method, clicking it switches to the next one
+    '''
+    return make_text(f'Method: {method}', TEXTCOLOR, BUTTONCOLOR,
+                     WINDOWWIDTH - 220, WINDOWHEIGHT - 120)
+
+
+def make_budget_button(time_budget):
+    '''
+        The time budget of the anytime method, clicking it switches to the next one
+    '''
+    return make_text(f'Budget: {time_budget:g} s', TEXTCOLOR, BUTTONCOLOR,
+                     WINDOWWIDTH - 220, WINDOWHEIGHT - 150)
+
+
+def describe_report(report) -> str:
+    '''
+        The length and the lower bound found by the anytime method
+    '''
+    if report['optimal']:
+        return f'{report["length"]} moves (optimal)'
+    return f'{report["length"]} moves, the optimum is at least {report["lower_bound"]}'
+
+
+def make_solve_button(solving):
+    '''
+        While a solve runs, the Solve button cancels it
+    '''
+    return make_text('Cancel' if solving else 'Solve', TEXTCOLOR, BUTTONCOLOR,
+                     WINDOWWIDTH - 120, WINDOWHEIGHT - 30)
+
+
+def cancel_solve():
+    '''
+        Stops the background solve, the moves it has not sent yet are dropped
+    '''
+    global WORKER, SOLVE_SURF, SOLVE_RECT
+    if WORKER:
+        WORKER.cancel()
+        WORKER = None
+        SOLVE_SURF, SOLVE_RECT = make_solve_button(False)
 
 
 def make_text(text, color, bgcolor, top, left):
@@ -235,6 +528,14 @@ def make_text(text, color, bgcolor, top, left):
     return (text_surf, text_rect)
 
 
+def tile_size(rows, cols) -> int:
+    '''
+        The largest tiles up to MAX_TILESIZE with which the board (and its 1 pixel borders) fits
+        into BOARD_WIDTH x BOARD_HEIGHT, at least 1 pixel
+    '''
+    return max(1, min(MAX_TILESIZE, (BOARD_WIDTH - cols - 1) // cols, (BOARD_HEIGHT - rows - 1) // rows))
+
+
 def get_topleft_of_tile(tile_x, tile_y):
     '''
         return the topleft coordinates of a tile
@@ -244,6 +545,35 @@ def get_topleft_of_tile(tile_x, tile_y):
     return (top, left)
 
 
+def render_tile(number):
+    '''
+        Renders a tile: background, image and number
+    '''
+    surf = pygame.Surface((TILESIZE, TILESIZE))
+    surf.fill(TILECOLOR)
+
+    if show_image:
+        surf.blit(IMAGES[number], (0, 0))
+    if not show_image or show_number:
+        text_surf = BASICFONT.render(str(number), True, TEXTCOLOR)
+        text_rect = text_surf.get_rect(center=(TILESIZE//2, TILESIZE//2))
+        if text_rect.width <= TILESIZE:  # the tiles of large boards are too small for their numbers
+            surf.blit(text_surf, text_rect)
+    return surf
+
+
+def get_tile_surf(number):
+    '''
+        The rendered tile, every tile is rendered only once for each image/number setting.
+        The cache is cleared when the board size or the images change.
+    '''
+    key = (int(number), show_image, show_number)
+    surf = TILE_CACHE.get(key)
+    if surf is None:
+        surf = TILE_CACHE[key] = render_tile(number)
+    return surf
+
+
 def draw_tile(tile_x, tile_y, number, adj_x=0, adj_y=0):
     '''
         draw a tile
@@ -251,31 +581,23 @@ def draw_tile(tile_x, tile_y, number, adj_x=0, adj_y=0):
         adj_x and adj_y is for animating
         they are small distances in the direction of the corresponding axles
     '''
-
-    global show_image, show_number
-
     top, left = get_topleft_of_tile(tile_x, tile_y)
-    pygame.draw.rect(DISPLAYSURF, TILECOLOR,
-                     (left + adj_x, top + adj_y, TILESIZE, TILESIZE))
+    DISPLAYSURF.blit(get_tile_surf(number), (left + adj_x, top + adj_y))
 
-    if show_image:
-        DISPLAYSURF.blit(IMAGES[number], (left + adj_x, top+adj_y))
-        if show_number:
-            text_surf = BASICFONT.render(str(number), True, TEXTCOLOR)
-            text_rect = text_surf.get_rect(
-                center=(left + TILESIZE//2 + adj_x, top + TILESIZE//2 + adj_y))
-            DISPLAYSURF.blit(text_surf, text_rect)
 
-    else:
-        text_surf = BASICFONT.render(str(number), True, TEXTCOLOR)
-        text_rect = text_surf.get_rect(
-            center=(left + TILESIZE//2 + adj_x, top + TILESIZE//2 + adj_y))
-        DISPLAYSURF.blit(text_surf, text_rect)
+def get_message_surf():
+    '''
+        The rendered status message, rendered again only when msg changes
+    '''
+    if MESSAGE_CACHE.get('msg') != msg:
+        MESSAGE_CACHE['msg'] = msg
+        MESSAGE_CACHE['text'] = make_text(msg, MESSAGECOLOR, BGCOLOR, 10, 10)
+    return MESSAGE_CACHE['text']
 
 
 def draw_board(board):
     DISPLAYSURF.fill(BGCOLOR)
-    text_suft, text_rect = make_text(msg, MESSAGECOLOR, BGCOLOR, 10, 10)
+    text_suft, text_rect = get_message_surf()
     DISPLAYSURF.blit(text_suft, text_rect)
 
     for coordinates in product(list(range(NUM_OF_ROWS)), list(range(NUM_OF_COLS))):
@@ -294,6 +616,69 @@ def draw_board(board):
     DISPLAYSURF.blit(RESET_SURF, RESET_RECT)
     DISPLAYSURF.blit(NEW_SURF, NEW_RECT)
     DISPLAYSURF.blit(SOLVE_SURF, SOLVE_RECT)
+    DISPLAYSURF.blit(METHOD_SURF, METHOD_RECT)
+    DISPLAYSURF.blit(BUDGET_SURF, BUDGET_RECT)
+    if profiler.PROFILER and profiler.PROFILER.hud:
+        draw_hud()
+
+
+def draw_hud():
+    '''
+        The profile in the bottom left corner, see profiler.py
+    '''
+    lines = profiler.PROFILER.hud_lines()
+    line_height = BASICFONTSIZE + 4
+    top = WINDOWHEIGHT - 10 - len(lines) * line_height
+    for number, line in enumerate(lines):
+        DISPLAYSURF.blit(*make_text(line, MESSAGECOLOR, BGCOLOR, 10, top + number * line_height))
+
+
+def draw_message():
+    '''
+        Draws the status message over the previous one
+        returns the changed rect
+    '''
+    old_rect = MESSAGE_CACHE['text'][1] if 'text' in MESSAGE_CACHE else None
+    text_surf, text_rect = get_message_surf()
+    rect = text_rect if old_rect is None else text_rect.union(old_rect)
+    DISPLAYSURF.fill(BGCOLOR, rect)
+    DISPLAYSURF.blit(text_surf, text_rect)
+    return rect
+
+
+def draw_cells(board, cells) -> list:
+    '''
+        Draws only the given cells of the board
+        returns their rects
+    '''
+    rects = []
+    for tile_x, tile_y in cells:
+        top, left = get_topleft_of_tile(tile_x, tile_y)
+        rect = pygame.Rect(left, top, TILESIZE, TILESIZE)
+        DISPLAYSURF.fill(BGCOLOR, rect)
+        if board[tile_x, tile_y] != BLANK:
+            draw_tile(tile_x, tile_y, board[tile_x, tile_y])
+        rects.append(rect)
+    return rects
+
+
+def count_misplaced(board) -> int:
+    '''
+        The number of cells (the BLANK's too) not holding their own tile
+    '''
+    return int(np.count_nonzero(board.flatten() != np.arange(board.size)))
+
+
+def misplaced_change(board, old_blank, new_blank) -> int:
+    '''
+        How count_misplaced changed by the move that took the BLANK from old_blank to new_blank
+        Only these two cells changed, the moved tile is in old_blank now.
+    '''
+    tile_home = divmod(int(board[old_blank]), NUM_OF_COLS)
+    blank_home = divmod(BLANK, NUM_OF_COLS)
+    before = (blank_home != old_blank) + (tile_home != new_blank)
+    after = (tile_home != old_blank) + (blank_home != new_blank)
+    return after - before
 
 
 def get_tile_clicked(board, x, y):
@@ -319,9 +704,10 @@ def get_all_positions(board) -> list:
     return positions
 
 
-def slide_animation(board, position, direction, speed):
+def slide_animation(board, position, direction, move_time):
     '''
-        Animates a move.
+        Animates a move in move_time seconds, the tile's place depends on the elapsed time.
+        The screen has to show the board before the move.
         Does not check if the move is valid
     '''
     blank_x, blank_y = position[BLANK]
@@ -335,26 +721,99 @@ def slide_animation(board, position, direction, speed):
     elif direction == 'down':
         move_x, move_y = blank_x - 1, blank_y
 
-    draw_board(board)
-    base_surf = DISPLAYSURF.copy()
+    # Only the two cells change, between them there is only background
     move_top, move_left = get_topleft_of_tile(move_x, move_y)
-    pygame.draw.rect(base_surf, BGCOLOR, (move_left,
-                     move_top, TILESIZE, TILESIZE))
-
-    for i in range(0, TILESIZE, speed):
+    blank_top, blank_left = get_topleft_of_tile(blank_x, blank_y)
+    dirty_rect = pygame.Rect(move_left, move_top, TILESIZE, TILESIZE).union(
+        (blank_left, blank_top, TILESIZE, TILESIZE))
+    tile_surf = get_tile_surf(board[move_x, move_y])
+
+    start = time.perf_counter()
+    progress = 0
+    while progress < 1:
         # animate the tile sliding over
         check_for_quit()
-        DISPLAYSURF.blit(base_surf, (0, 0))
+        progress = min((time.perf_counter() - start) / move_time, 1)
+        DISPLAYSURF.fill(BGCOLOR, dirty_rect)
+        DISPLAYSURF.blit(tile_surf, (move_left + round((blank_left - move_left) * progress),
+                                     move_top + round((blank_top - move_top) * progress)))
+        pygame.display.update(dirty_rect)
+        FPSCLOCK.tick(FPS)
+
+
+def play_moves(board, position, movelist, move_time=MOVE_TIME, duration=None) -> list:
+    '''
+        Makes and animates the moves.
+        duration: if given, the whole list takes at most this many seconds.
+        If a move would be shorter than a frame, several moves are made in one frame
+        and only the changed cells are drawn.
+        returns the moves
+    '''
+    if duration is not None and movelist:
+        move_time = min(move_time, duration / len(movelist))
+
+    frame_time = 1 / FPS
+    if move_time >= frame_time:
+        for move in movelist:
+            make_move(board, position, move, animation_time=move_time)
+        return list(movelist)
+
+    # fast-forward
+    moves_per_frame = math.ceil(frame_time / move_time)
+    for start in range(0, len(movelist), moves_per_frame):
+        check_for_quit()
+        changed = set()
+        for move in movelist[start:start + moves_per_frame]:
+            changed.add(position[BLANK])
+            make_move(board, position, move, animation=False)
+        changed.add(position[BLANK])
+        pygame.display.update(draw_cells(board, changed))
+        FPSCLOCK.tick(FPS)
+    return list(movelist)
 
-        if direction == 'up':
-            draw_tile(move_x, move_y, board[move_x, move_y], 0, -i)
-        elif direction == 'down':
-            draw_tile(move_x, move_y, board[move_x, move_y], 0, i)
-        elif direction == 'left':
-            draw_tile(move_x, move_y, board[move_x, move_y], -i, 0)
-        elif direction == 'right':
-            draw_tile(move_x, move_y, board[move_x, move_y], i, 0)
 
+def replay_solution(board, position, solution_file, duration=PLAYBACK_DURATION):
+    '''
+        Plays a solution file on the board, reading it chunk by chunk.
+        Stops before the first move that is not valid, or where the file is broken.
+        returns the moves made and the message why it stopped, None if the whole file was played
+    '''
+    state = BoardState.from_board(board)
+    made = []
+    try:
+        total = None if is_legacy(solution_file) else read_board(solution_file)[1]
+        for chunk in iter_move_chunks(solution_file, names=False):
+            valid = []
+            for move in chunk:
+                if not state.is_valid(move):
+                    break
+                state.make(move)
+                valid.append(move)
+            move_time = min(MOVE_TIME, duration / (total or len(chunk) or 1))  # an old file may hold []
+            made.extend(play_moves(board, position, decode_moves(valid), move_time))
+            if len(valid) < len(chunk):
+                return made, f'Invalid move after {len(made)} moves in {solution_file}.'
+    except ValueError as error:
+        return made, f'{error} (after {len(made)} moves)'
+    return made, None
+
+
+def crossfade(board, fade_time=RESET_FADE):
+    '''
+        Fades from the screen to the board in fade_time seconds
+    '''
+    old_surf = DISPLAYSURF.copy()
+    draw_board(board)
+    new_surf = DISPLAYSURF.copy()
+
+    start = time.perf_counter()
+    progress = 0
+    while progress < 1:
+        check_for_quit()
+        progress = min((time.perf_counter() - start) / fade_time, 1)
+        new_surf.set_alpha(round(255 * progress))
+        DISPLAYSURF.blit(old_surf, (0, 0))
+        DISPLAYSURF.blit(new_surf, (0, 0))
         pygame.display.update()
         FPSCLOCK.tick(FPS)
 
@@ -364,7 +823,7 @@ def check_for_quit():
         pygame.quit()
         sys.exit()
     for event in pygame.event.get(pygame.KEYDOWN):  # get all the KEYUP events
-        if event.key == pygame.K_ESCAPE:
+        if event.key == pygame.K_ESCAPE and not WORKER:  # else it cancels the solve
             pygame.quit()
             sys.exit()
         pygame.event.post(event)  # put the other KEYUP event objects back
@@ -382,14 +841,14 @@ def is_valid_move(position, move) -> bool:
         (move == 'right' and blank_y != 0)
 
 
-def make_move(board, position, move, animation=True, animation_speed=8) -> str:
+def make_move(board, position, move, animation=True, animation_time=MOVE_TIME) -> str:
     '''
         Does not check if a move is valid
         changes board and position
         returns the move
     '''
     if animation:
-        slide_animation(board, position, move, animation_speed)
+        slide_animation(board, position, move, animation_time)
 
     blank_x, blank_y = position[BLANK]
 
@@ -410,331 +869,16 @@ def make_move(board, position, move, animation=True, animation_speed=8) -> str:
     return move
 
 
-def do_movelist(board, positions, movelist, animation=True, animation_speed=8) -> list:
+def do_movelist(board, positions, movelist, animation=True, move_time=MOVE_TIME, duration=None) -> list:
     """
         Executes a movelist
+        duration: the longest time the animation of the whole list may take, in seconds
     """
+    if animation:
+        return play_moves(board, positions, movelist, move_time, duration)
     moves = []
     for move in movelist:
-        moves.append(make_move(board, positions, move,
-                     animation, animation_speed))
-    return moves
-
-
-def reverse_moves(moves) -> list:
-    opposite_moves = {'left': 'right',
-                      'right': 'left',
-                      'up': 'down',
-                      'down': 'up'}
-
-    reversed = [opposite_moves[move] for move in moves]
-    reversed.reverse()
-    return reversed
-
-
-def order_board(original_board, original_position):
-    '''
-        Given a board, make a copy of is.
-        Moves the blank tile to the bottom right corner with legal moves
-        return ordered board
-    '''
-    board = np.copy(original_board)
-    position = list.copy(original_position)
-    while position[BLANK][0] != NUM_OF_ROWS-1:
-        make_move(board, position, 'up', animation=False)
-    while position[BLANK][1] != NUM_OF_COLS-1:
-        make_move(board, position, 'left', animation=False)
-    return board
-
-
-def if_solvable(board, position) -> bool:
-    '''
-        Determines whether a given board is solvable or not
-    '''
-    ordered_board = order_board(board, position)
-    permutations = Permutation(ordered_board.flatten())
-
-    return (Permutation.parity(permutations) == 0)
-
-
-def move_blank_to(board, position, x, y) -> list:
-    '''
-        Moves BLANK to the given coordinate: x,y
-    '''
-    moves = []
-    # Moves in lines
-    while position[BLANK][1] != y:
-        if position[BLANK][1] < y:
-            moves.append(make_move(board, position, 'left'))
-        else:
-            moves.append(make_move(board, position, 'right'))
-
-    # Moves in columns
-    while position[BLANK][0] != x:
-        if position[BLANK][0] < x:
-            moves.append(make_move(board, position, 'up'))
-        else:
-            moves.append(make_move(board, position, 'down'))
-    return moves
-
-
-def move_tile_to(board, position, tile, x, y) -> list:
-    '''
-        Moves tile to the given coordinate: x,y
-        tile: number of the tile
-        we don't touch tiles on the left and top of x, y
-            if not necessary.
-    '''
-    moves = []
-
-    # Moves in lines
-    if position[tile][0] == NUM_OF_ROWS-1:  # If in the last row, take it out
-        moves.extend(move_blank_to(board, position, NUM_OF_ROWS -
-                                   2, position[BLANK][1]))
-        moves.extend(move_blank_to(board, position,
-                                   position[tile][0]-1, position[tile][1]))
-        moves.append(make_move(board, position, 'up'))
-
-    while position[tile][1] != y:
-        moves.extend(move_blank_to(board, position,
-                                   position[tile][0]+1, position[BLANK][1]))
-        if position[tile][1] < y:
-            moves.extend(move_blank_to(
-                board, position, position[tile][0], position[tile][1]+1))
-            moves.append(make_move(board, position, 'right'))
-        else:
-            moves.extend(move_blank_to(
-                board, position, position[tile][0], position[tile][1]-1))
-            moves.append(make_move(board, position, 'left'))
-
-    # If the BLANK and tile would be in the same row, it would get wrong
-    if position[tile][0] == position[BLANK][0] and position[tile][1] > position[BLANK][1]:
-        moves.extend(move_blank_to(board, position,
-                                   position[tile][0]+1, position[BLANK][1]))
-
-    # Moves in Column
-    if position[tile][1] == NUM_OF_COLS-1:  # If in the last co, take it out
-        moves.extend(move_blank_to(board, position,
-                                   position[BLANK][0], NUM_OF_COLS-2))
-        moves.extend(move_blank_to(board, position,
-                                   position[tile][0], position[tile][1]-1))
-        moves.append(make_move(board, position, 'left'))
-
-    while position[tile][0] != x:
-        moves.extend(move_blank_to(board, position,
-                                   position[BLANK][0], position[tile][1]+1))
-        moves.extend(move_blank_to(board, position,
-                                   position[tile][0]-1, position[BLANK][1]))
-        moves.extend(move_blank_to(board, position,
-                                   position[BLANK][0], position[tile][1]))
-        moves.append(make_move(board, position, 'up'))
-
-    return moves
-
-
-def first_rows(board, position) -> list:
-    '''
-        Solves the first NUM_OF_ROWS-2 rows
-    '''
-    moves = []
-
-    for i, j in product(list(range(NUM_OF_ROWS-2)), list(range(NUM_OF_COLS))):
-        # Tries to move the correct tile into (i,j)
-
-        if j < NUM_OF_COLS-2:  # if not the last 2 columns
-            tile = i*NUM_OF_COLS+j
-            moves.extend(move_tile_to(board, position, tile, i, j))
-
-        # If the col before the last: we take here the last element
-        elif j == NUM_OF_COLS-2:
-            tile = i*NUM_OF_COLS+j+1
-
-            # If the last would be next to it, we woult get stucked
-            if board[i][j] == i*NUM_OF_COLS+j:
-                moves.extend(move_blank_to(board, position, i, j))
-                moves.append(make_move(board, position, 'left'))
-            moves.extend(move_tile_to(board, position, tile, i, j))
-
-        else:  # Last column
-            # We take the elements before the last to their place,
-            # The last element will go to its place automatically
-            tile = i*NUM_OF_COLS+j-1
-            if position[BLANK] == (i, j):  # Solves: 0 1 3 15
-                #  * * * 2
-                moves.append(make_move(board, position, 'up'))
-            if position[tile] == (i, j):  # Solves if the order: 0 1 3 2
-                moves.extend(move_blank_to(board, position, i, j-1))
-
-                moves_to_do = ['left', 'up', 'up',
-                               'right', 'down', 'down', 'left']
-                moves.extend(do_movelist(board, position, moves_to_do))
-
-                moves.extend(move_tile_to(board, position, tile+1, i, j-1))
-            moves.extend(move_tile_to(board, position, tile, i+1, j-1))
-            moves.extend(move_tile_to(board, position,
-                         tile, i, position[tile][1]))
-
-    return moves
-
-
-def swap_in_col(board, positions) -> list:
-    moves_to_do = ['right', 'up', 'left', 'left', 'down', 'right', 'right', 'up', 'left', 'down',
-                   'right', 'up', 'left', 'left', 'down', 'right', 'up', 'left', 'down', 'right', 'right', 'up', 'left', 'down']
-    moves = do_movelist(board, positions, moves_to_do)
-    return moves
-
-
-def rotate_in_bottom_square(board, positions, tile):
-    """
-        Given an array of moves, the functions executes the moves
-    """
-    moves = []
-    if positions[tile] == (NUM_OF_ROWS-1, NUM_OF_COLS-2):
-        moves.append(make_move(board, positions, 'up'))
-    elif positions[tile] == (NUM_OF_ROWS-1, NUM_OF_COLS-1):
-        moves_to_do = ['left', 'up', 'right', 'down', 'left']
-        moves.extend(do_movelist(board, positions, moves_to_do))
-    else:
-        moves.append(make_move(board, positions, 'left'))
-    return moves
-
-
-def order_66(board, positions):
-    """
-        Finishes the M-3. column
-    """
-    moves = []
-    moves.extend(move_blank_to(board, positions,
-                 NUM_OF_ROWS-1, positions[BLANK][1]))
-    moves.extend(move_blank_to(board, positions, NUM_OF_ROWS-1, NUM_OF_COLS-3))
-    moves.extend(do_movelist(board, positions, ['down', 'left']))
-    return moves
-
-
-def last_rows(board, positions):
-    """
-        Solves the last rows of the puzzle for, N*M size puzzle
-        (Solves a 2*M, within the 2*M box)
-    """
-    moves = []
-    if NUM_OF_COLS == 2:
-        moves.extend(move_blank_to(board, positions,
-                     NUM_OF_ROWS-2, NUM_OF_COLS-2))
-        # Order 66, garanties that the BLANK will finish on (N-1,M-1)
-        tile_upper = (NUM_OF_ROWS-2) * NUM_OF_COLS + \
-            NUM_OF_COLS - 2  # tile (N-1, M-1)
-        moves_to_do = []
-        # Sorting out how to move the (N-1,N-1) tile to its place, and finish the puzzle
-        if positions[tile_upper] == (NUM_OF_ROWS-1, NUM_OF_COLS - 2):
-            moves_to_do = ['up', 'left']
-        elif positions[tile_upper] == (NUM_OF_ROWS-1, NUM_OF_COLS - 1):
-            moves_to_do = ['left', 'up', 'right', 'down', 'left', 'up']
-        else:
-            moves_to_do = ['left', 'up']
-        moves.extend(do_movelist(board, positions, moves_to_do))
-
-        return moves
-
-        # We will start from the left side, and do a column in one loop
-    for j in range(NUM_OF_COLS-3):
-
-        # The two number we will be working with, in the solved state tile_upper supposed to
-        # be on the top of tile_below (this is for positions array)
-        tile_upper = (NUM_OF_ROWS-2) * NUM_OF_COLS + j  # tile (N-1, j+1)
-        tile_below = (NUM_OF_ROWS-1) * NUM_OF_COLS + j  # tile ( N , j+1)
-
-        # Completing the j.-th column consists of 3 steps:
-        # 1. Move the "below" tile to coordinates (N-1 , j) (The N-1.th row, and j.-th column)
-        # 2. Check whether the "upper" tile is below the "below" tile
-        #       - In this case, there is a series of steps, to put them in order
-        # 3. If not, then move the "upper" tile to the right of "below"
-        # 4. Move the BLANK under "below", then you can just do a "down" and "left" move and
-        #      the column will be completed (when moving BLANKn we dont disturb "below" and "upper")
-        #   ROWS\COL         i                                i
-        #   (N-1)   [ DONE |          ]     1.      [ DONE |"below"       ]     3.
-        #   (N  )   [ DONE |          ]   ------>   [ DONE |              ]  ------->
-        #                      i
-        #   (N-1)   [ DONE |"below" "upper"]     4.      [ DONE |"below" "upper"]    4,5.
-        #   (N  )   [ DONE |               ]   ------>   [ DONE | BLANK         ]  ------->
-        #
-        #   (N-1)   [ DONE |"upper"  BLANK ]
-        #   (N  )   [ DONE |"below"        ]
-        #
-        #   If, after the first step, "upper" is below "below", we can get to the end in one step
-
-        # 1. Move the "below" tile to coordinates (N-1 , j) (The N-1.th row, and j.-th column)
-        moves.extend(move_tile_to(board, positions,
-                     tile_below, NUM_OF_ROWS-2, j))
-        moves.extend(move_blank_to(board, positions, NUM_OF_ROWS-2, j+1))
-
-        # 2. If "upper" is below "below" we can just swap them
-        if positions[tile_upper] == (NUM_OF_ROWS-1, j):
-            moves.extend(swap_in_col(board, positions))
-        else:
-            # 3. else move the "upper" tile to the right of "below"
-            moves.extend(move_tile_to(board, positions, tile_upper,
-                                      NUM_OF_ROWS-2, j+1))
-            # move BLANK below "below" (first to the N.-th column, then below "below")
-            moves.extend(move_blank_to(board, positions,
-                                       NUM_OF_ROWS-1, positions[BLANK][1]))
-            moves.extend(move_blank_to(board, positions,
-                                       NUM_OF_ROWS-1, j))
-            # make a "down" and a "left" move, to finish the column
-            moves.extend(do_movelist(board, positions, ['down', 'left']))
-
-    # Last six tile
-    # The N-2.th column
-    tile_upper = (NUM_OF_ROWS-2) * NUM_OF_COLS + \
-        NUM_OF_COLS - 3  # tile (N-1, N-2)
-    tile_below = (NUM_OF_ROWS-1) * NUM_OF_COLS + \
-        NUM_OF_COLS - 3  # tile ( N , N-2)
-
-    # Move the "below" tile to (N-1, M-2)
-    moves.extend(move_tile_to(board, positions, tile_below,
-                              NUM_OF_ROWS-2, NUM_OF_COLS-3))
-    # Move BLANK to (N-1, M-1)
-    moves.extend(move_blank_to(board, positions,
-                               NUM_OF_ROWS-2, NUM_OF_COLS-2))
-
-    # if "upper" is below "below" we can swap
-    if positions[tile_upper] == (NUM_OF_ROWS-1, NUM_OF_COLS-3):
-        moves.extend(swap_in_col(board, positions))
-    # if not, then we move the "upper" tile beside "below" tile, then finish the column
-    # for different poitions, we need different moves to move th "upper" tile
-    elif positions[tile_upper] == (NUM_OF_ROWS-1, NUM_OF_COLS-2):
-        moves.append(make_move(board, positions, 'up'))
-        moves.extend(order_66(board, positions))
-    elif positions[tile_upper] == (NUM_OF_ROWS-1, NUM_OF_COLS-1):
-        moves_to_do = ['left', 'up', 'right', 'down', 'left']
-        moves.extend(do_movelist(board, positions, moves_to_do))
-        moves.extend(order_66(board, positions))
-    else:
-        moves.append(make_move(board, positions, 'left'))
-        moves.extend(order_66(board, positions))
-    # Order 66, garanties that the BLANK will finish on (N-1,M-1)
-    tile_upper = (NUM_OF_ROWS-2) * NUM_OF_COLS + \
-        NUM_OF_COLS - 2  # tile (N-1, M-1)
-    moves_to_do = []
-    # Sorting out how to move the (N-1,N-1) tile to its place, and finish the puzzle
-    if positions[tile_upper] == (NUM_OF_ROWS-1, NUM_OF_COLS - 2):
-        moves_to_do = ['up', 'left']
-    elif positions[tile_upper] == (NUM_OF_ROWS-1, NUM_OF_COLS - 1):
-        moves_to_do = ['left', 'up', 'right', 'down', 'left', 'up']
-    else:
-        moves_to_do = ['left', 'up']
-    moves.extend(do_movelist(board, positions, moves_to_do))
-
-    return moves
-
-
-def solve_board(board, position, SOLVEDBOARD):
-    '''
-        Solve the puzzle
-    '''
-    moves = []
-    if not np.all(board[:NUM_OF_ROWS-2:] == SOLVEDBOARD[:NUM_OF_ROWS-2:]):
-        moves.extend(first_rows(board, position))
-    moves.extend((last_rows(board, position)))
+        moves.append(make_move(board, positions, move, animation=False))
     return moves
 
 
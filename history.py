@@ -0,0 +1,100 @@
+'''
+    Undo and redo history of the game
+
+    The moves are kept as one byte each (the codes of board_state), with a
+    copy of the tiles every snapshot_interval moves, so any point of the
+    history can be restored without replaying it from the start.
+    A move that undoes the last one is not recorded, it removes the last one.
+'''
+
+from board_state import BoardState, MOVE_CODES, MOVES
+
+
+# Moves between two snapshots at least, bigger boards take one every board size moves,
+# so the snapshots never take more memory than the moves
+SNAPSHOT_INTERVAL = 1024
+
+
+class MoveHistory:
+    '''
+        moves[:position] are made, moves[position:] are undone and can be redone
+        until a new move is recorded.
+        Moves go in and come out as names: 'left', ...
+    '''
+
+    def __init__(self, board):
+        self.state = BoardState.from_board(board)
+        self.moves = bytearray()
+        self.position = 0
+        self.snapshot_interval = max(SNAPSHOT_INTERVAL, self.state.rows * self.state.cols)
+        self.snapshots = [self.state.tiles[:]]  # snapshots[i]: the tiles after i * snapshot_interval moves
+
+    def __len__(self) -> int:
+        return self.position
+
+    def record(self, move):
+        '''
+            A new move was made, the undone moves are forgotten
+        '''
+        code = MOVE_CODES[move]
+        self.truncate()
+        self.state.make(code)
+        if self.position and self.moves[-1] == code ^ 1:
+            del self.moves[-1]
+            self.position -= 1
+            self.truncate()
+            return
+        self.moves.append(code)
+        self.position += 1
+        if not self.position % self.snapshot_interval:
+            self.snapshots.append(self.state.tiles[:])
+
+    def extend(self, moves):
+        for move in moves:
+            self.record(move)
+
+    def truncate(self):
+        del self.moves[self.position:]
+        del self.snapshots[self.position // self.snapshot_interval + 1:]
+
+    def undo(self):
+        '''
+            returns the move that undoes the last one, None if there is nothing to undo
+        '''
+        if not self.position:
+            return None
+        self.position -= 1
+        code = self.moves[self.position] ^ 1
+        self.state.make(code)
+        return MOVES[code]
+
+    def redo(self):
+        '''
+            returns the last undone move, None if there is nothing to redo
+        '''
+        if self.position == len(self.moves):
+            return None
+        code = self.moves[self.position]
+        self.position += 1
+        self.state.make(code)
+        return MOVES[code]
+
+    def board_at(self, position) -> list:
+        '''
+            The board after the first position moves, from the nearest snapshot
+        '''
+        snapshot = position // self.snapshot_interval
+        state = BoardState(self.state.rows, self.state.cols, self.snapshots[snapshot])
+        for code in self.moves[snapshot * self.snapshot_interval:position]:
+            state.make(code)
+        return state.to_board()
+
+    def jump(self, position) -> list:
+        '''
+            Goes to any point of the history at once, the later moves can be redone
+            returns the board there
+        '''
+        board = self.board_at(position)
+        self.position = position
+        self.state = BoardState.from_board(board)
+        return board
@@ -0,0 +1,239 @@
+'''
+    Optimal solver
+
+    Iterative deepening A* with the Manhattan distance + linear conflict
+    heuristic. The heuristic is updated incrementally on every move and the
+    search works on one flat board list that is changed and restored in place,
+    so no objects are created per node.
+'''
+
+from itertools import product
+from board_state import BoardState, MOVES, move_tables
+
+
+FOUND = -1
+# solve_optimal refuses larger boards, a random 4x4 board takes from seconds to minutes already
+MAX_CELLS = 16
+# Line conflict tables larger than this are not built, the heuristic falls back to Manhattan distance
+MAX_CONFLICT_TABLE = 1 << 20
+
+
+class Cancelled(Exception):
+    pass
+
+
+def longest_increasing(sequence) -> int:
+    '''
+        Length of the longest strictly increasing subsequence
+    '''
+    tails = []
+    for x in sequence:
+        lo, hi = 0, len(tails)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if tails[mid] < x:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == len(tails):
+            tails.append(x)
+        else:
+            tails[lo] = x
+    return len(tails)
+
+
+def conflict_table(width):
+    '''
+        returns a list, i_th element is the linear conflict of the line with code i.
+        A line of width w is coded in base w+1, digit c is the goal place of the tile
+        in cell c if it belongs to this line, w otherwise.
+        Each conflict costs 2 moves: 2 * (tiles of the line - longest ordered subsequence)
+    '''
+    base = width + 1
+    if base ** width > MAX_CONFLICT_TABLE:
+        return None
+    table = bytearray(base ** width)
+    for code in range(base ** width):
+        goals = []
+        rest = code
+        for _ in range(width):
+            rest, digit = divmod(rest, base)
+            if digit != width:
+                goals.append(digit)
+        table[code] = 2 * (len(goals) - longest_increasing(goals))
+    return table
+
+
+class IDAStar:
+    '''
+        Searches shortest solutions for one board size, the tables are reused between boards.
+    '''
+
+    def __init__(self, rows, cols):
+        self.rows = rows
+        self.cols = cols
+        size = rows * cols
+        self.blank = size - 1
+
+        # neighbors[cell] = ((move, cell of the tile that slides into cell), ...)
+        self.neighbors = move_tables(rows, cols).moves_from
+
+        # manhattan[tile][cell]
+        self.manhattan = [[abs(tile // cols - cell // cols) + abs(tile % cols - cell % cols)
+                           for cell in range(size)] for tile in range(size)]
+
+        # row_digit[tile][cell]: what the tile adds to the code of its row when it is in cell
+        # the BLANK (and tiles of other lines) add the "none" digit
+        self.row_table = conflict_table(cols)
+        self.col_table = conflict_table(rows)
+        self.use_conflicts = self.row_table is not None and self.col_table is not None
+        row_base, col_base = cols + 1, rows + 1
+        self.row_digit = [[0] * size for _ in range(size)]
+        self.col_digit = [[0] * size for _ in range(size)]
+        for tile, cell in product(range(size), range(size)):
+            x, y = divmod(cell, cols)
+            in_row = tile != self.blank and tile // cols == x
+            in_col = tile != self.blank and tile % cols == y
+            self.row_digit[tile][cell] = (tile % cols if in_row else cols) * row_base ** y
+            self.col_digit[tile][cell] = (tile // cols if in_col else rows) * col_base ** x
+
+    def heuristic(self, board) -> int:
+        '''
+            Manhattan distance + linear conflict of a flat board
+        '''
+        h = sum(self.manhattan[tile][cell] for cell, tile in enumerate(board) if tile != self.blank)
+        if self.use_conflicts:
+            row_codes, col_codes = self.line_codes(board)
+            h += sum(self.row_table[code] for code in row_codes)
+            h += sum(self.col_table[code] for code in col_codes)
+        return h
+
+    def line_codes(self, board):
+        row_codes = [0] * self.rows
+        col_codes = [0] * self.cols
+        for cell, tile in enumerate(board):
+            row_codes[cell // self.cols] += self.row_digit[tile][cell]
+            col_codes[cell % self.cols] += self.col_digit[tile][cell]
+        return row_codes, col_codes
+
+    def solve(self, board, should_stop=None) -> list:
+        '''
+            board: 2D board (numpy array or nested lists)
+            should_stop: optional function, checked regularly, the search gives up if it returns True
+            returns the shortest list of moves, None if cancelled
+        '''
+        state = BoardState.from_board(board)
+        board = state.tiles
+        blank = self.blank
+        cols = self.cols
+        neighbors = self.neighbors
+        manhattan = self.manhattan
+        row_digit, col_digit = self.row_digit, self.col_digit
+        row_table, col_table = self.row_table, self.col_table
+        use_conflicts = self.use_conflicts
+        row_codes, col_codes = self.line_codes(board)
+
+        # the longest path is not known in advance, the list grows only when the bound does
+        path = []
+        length = 0
+        nodes = 0
+
+        def search(g, bound, blank_cell, prev, h):
+            nonlocal nodes, length
+            f = g + h
+            if f > bound:
+                return f
+            if h == 0:
+                length = g
+                return FOUND
+            nodes += 1
+            if should_stop is not None and not nodes & 0xfff and should_stop():
+                raise Cancelled
+            minimum = 1 << 30
+            for move, cell in neighbors[blank_cell]:
+                if move == prev ^ 1:
+                    continue
+                tile = board[cell]
+                # The tile slides from cell to blank_cell
+                new_h = h + manhattan[tile][blank_cell] - manhattan[tile][cell]
+                if use_conflicts:
+                    row_old, row_new = cell // cols, blank_cell // cols
+                    col_old, col_new = cell % cols, blank_cell % cols
+                    if row_old == row_new:
+                        # moves inside a row: only the two column conflicts can change
+                        old_a, old_b = col_codes[col_old], col_codes[col_new]
+                        new_a = old_a - col_digit[tile][cell] + col_digit[blank][cell]
+                        new_b = old_b - col_digit[blank][blank_cell] + col_digit[tile][blank_cell]
+                        new_h += col_table[new_a] + col_table[new_b] - col_table[old_a] - col_table[old_b]
+                        col_codes[col_old], col_codes[col_new] = new_a, new_b
+                        row_codes[row_old] += row_digit[tile][blank_cell] + row_digit[blank][cell] \
+                            - row_digit[tile][cell] - row_digit[blank][blank_cell]
+                    else:
+                        old_a, old_b = row_codes[row_old], row_codes[row_new]
+                        new_a = old_a - row_digit[tile][cell] + row_digit[blank][cell]
+                        new_b = old_b - row_digit[blank][blank_cell] + row_digit[tile][blank_cell]
+                        new_h += row_table[new_a] + row_table[new_b] - row_table[old_a] - row_table[old_b]
+                        row_codes[row_old], row_codes[row_new] = new_a, new_b
+                        col_codes[col_old] += col_digit[tile][blank_cell] + col_digit[blank][cell] \
+                            - col_digit[tile][cell] - col_digit[blank][blank_cell]
+
+                board[blank_cell], board[cell] = tile, blank
+                path[g] = move
+                result = search(g + 1, bound, cell, move, new_h)
+                board[blank_cell], board[cell] = blank, tile
+                if result == FOUND:
+                    return FOUND
+
+                if use_conflicts:
+                    # restore the line codes
+                    if row_old == row_new:
+                        col_codes[col_old], col_codes[col_new] = old_a, old_b
+                        row_codes[row_old] -= row_digit[tile][blank_cell] + row_digit[blank][cell] \
+                            - row_digit[tile][cell] - row_digit[blank][blank_cell]
+                    else:
+                        row_codes[row_old], row_codes[row_new] = old_a, old_b
+                        col_codes[col_old] -= col_digit[tile][blank_cell] + col_digit[blank][cell] \
+                            - col_digit[tile][cell] - col_digit[blank][blank_cell]
+                if result < minimum:
+                    minimum = result
+            return minimum
+
+        bound = self.heuristic(board)
+        blank_cell = state.blank_cell
+        try:
+            while True:
+                path.extend([None] * (bound + 1 - len(path)))
+                result = search(0, bound, blank_cell, -2, self.heuristic(board))
+                if result == FOUND:
+                    return [MOVES[move] for move in path[:length]]
+                bound = result
+        except Cancelled:
+            return None
+
+
+# The searchers built so far, by size: their tables are built once
+SEARCHERS = {}
+
+
+def supports(rows, cols) -> bool:
+    return rows * cols <= MAX_CELLS
+
+
+def get_searcher(rows, cols) -> IDAStar:
+    '''
+        The searcher of the size from SEARCHERS, built on the first call
+    '''
+    if (rows, cols) not in SEARCHERS:
+        SEARCHERS[(rows, cols)] = IDAStar(rows, cols)
+    return SEARCHERS[(rows, cols)]
+
+
+def solve_optimal(board, should_stop=None) -> list:
+    '''
+        Returns a shortest list of moves solving the board, the board is not changed.
+        The board has to be solvable and have at most MAX_CELLS cells.
+    '''
+    rows, cols = len(board), len(board[0])
+    if not supports(rows, cols):
+        raise ValueError(f'The optimal method only solves boards up to {MAX_CELLS} cells, not {rows}x{cols}')
+    return get_searcher(rows, cols).solve(board, should_stop)
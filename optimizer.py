@@ -0,0 +1,190 @@
+'''
+    Shortening move lists
+
+    The constructive solver routes the BLANK in fixed shapes and puts its steps
+    one after the other, so its solutions contain moves that undo each other
+    and detours that come back to a board seen before. These passes remove them,
+    and can replace short windows of the list with a shortest path between the
+    boards at the two ends.
+
+    Every function works on move codes (see board_state) and does not change
+    the board it gets.
+'''
+
+import random
+from board_state import BoardState, decode_moves, encode_moves
+
+
+HASH_MASK = (1 << 64) - 1
+# A window is only searched if it could get at least this much shorter
+MIN_GAIN = 2
+
+
+def cancel_inverses(moves) -> list:
+    '''
+        Removes moves followed by their inverse, also the pairs that meet after a removal
+    '''
+    result = []
+    for move in moves:
+        if result and result[-1] == move ^ 1:
+            result.pop()
+        else:
+            result.append(move)
+    return result
+
+
+def remove_loops(board, moves) -> list:
+    '''
+        Cuts every part of the list that returns to a board seen before.
+        Boards are compared by a 64 bit hash, which changes in O(1) per move:
+        sum of (tile + 1) * key[cell], so a move adds (BLANK - tile) * (key[new BLANK cell] - key[old BLANK cell]).
+    '''
+    state = BoardState.from_board(board)
+    size = state.rows * state.cols
+    blank = state.blank
+    keys = [random.getrandbits(64) for _ in range(size)]
+    target = state.tables.target
+    tiles = list(state.tiles)
+
+    board_hash = sum((tile + 1) * keys[cell] for cell, tile in enumerate(tiles)) & HASH_MASK
+    blank_cell = state.blank_cell
+    # seen[hash] = number of moves kept when the board was reached, hashes[i] = hash after i moves
+    seen = {board_hash: 0}
+    hashes = [board_hash]
+    result = []
+
+    for move in moves:
+        cell = target[blank_cell * 4 + move]
+        tile = tiles[cell]
+        tiles[blank_cell], tiles[cell] = tile, blank
+        board_hash = (board_hash + (blank - tile) * (keys[cell] - keys[blank_cell])) & HASH_MASK
+        blank_cell = cell
+
+        if board_hash in seen:
+            # back to an earlier board: forget everything since then
+            kept = seen[board_hash]
+            for dropped in hashes[kept + 1:]:
+                del seen[dropped]
+            del hashes[kept + 1:], result[kept:]
+        else:
+            result.append(move)
+            seen[board_hash] = len(result)
+            hashes.append(board_hash)
+
+    return result
+
+
+def final_board(board, moves):
+    '''
+        returns the tiles after the moves as bytes, None if a move is not valid
+    '''
+    state = BoardState.from_board(board)
+    for move in moves:
+        if not state.is_valid(move):
+            return None
+        state.make(move)
+    return state.key()
+
+
+def shortest_between(start, goal, cols, limit):
+    '''
+        IDA* with the Manhattan distance from start to goal (flat tile lists)
+        returns a list of moves no longer than limit, None if there is none
+    '''
+    size = len(start)
+    rows = size // cols
+    blank = size - 1
+    state = BoardState(rows, cols, start)
+    board = state.tiles
+    neighbors = state.tables.moves_from
+    home = [0] * size
+    for cell, tile in enumerate(goal):
+        home[tile] = cell
+    distance = [[abs(cell // cols - home[tile] // cols) + abs(cell % cols - home[tile] % cols)
+                 for cell in range(size)] for tile in range(size)]
+
+    h = sum(distance[tile][cell] for cell, tile in enumerate(board) if tile != blank)
+    path = []
+
+    def search(g, bound, blank_cell, prev, h):
+        if g + h > bound:
+            return g + h
+        if h == 0:
+            return -1
+        minimum = 1 << 30
+        for move, cell in neighbors[blank_cell]:
+            if move == prev ^ 1:
+                continue
+            tile = board[cell]
+            board[blank_cell], board[cell] = tile, blank
+            path.append(move)
+            result = search(g + 1, bound, cell, move,
+                            h + distance[tile][blank_cell] - distance[tile][cell])
+            if result == -1:
+                return -1
+            path.pop()
+            board[blank_cell], board[cell] = blank, tile
+            minimum = min(minimum, result)
+        return minimum
+
+    bound = h
+    while bound <= limit:
+        result = search(0, bound, state.blank_cell, -2, h)
+        if result == -1:
+            return path
+        bound = result
+    return None
+
+
+def resolve_windows(board, moves, window, offset=0, should_stop=None) -> list:
+    '''
+        Cuts the list into windows of the given length (the first one is offset long)
+        and replaces every window with a shortest path between its two ends if that is shorter
+        should_stop: optional function, checked between the windows, the rest is kept as it is
+    '''
+    state = BoardState.from_board(board)
+    cols = state.cols
+    result = []
+    start = 0
+    end = offset if offset else window
+    while start < len(moves):
+        if should_stop is not None and should_stop():
+            result.extend(moves[start:])
+            break
+        part = moves[start:end]
+        before = list(state.tiles)
+        for move in part:
+            state.make(move)
+        # paths between two boards have the same parity, so a shorter one is at least 2 shorter
+        shorter = shortest_between(before, list(state.tiles), cols, len(part) - MIN_GAIN) \
+            if len(part) >= MIN_GAIN else None
+        result.extend(part if shorter is None else shorter)
+        start, end = end, end + window
+    return result
+
+
+def optimize(board, moves, window=None, should_stop=None) -> list:
+    '''
+        board: the board the moves start from
+        moves: move codes
+        window: if given, windows of this length are also re-solved optimally
+        should_stop: optional function, the window passes stop early if it returns True
+        returns the shortened move codes, ending on the same board
+    '''
+    result = remove_loops(board, cancel_inverses(moves))
+    if window:
+        # the second pass is shifted by half a window, to catch what the borders cut
+        result = resolve_windows(board, result, window, should_stop=should_stop)
+        result = resolve_windows(board, result, window, max(window // 2, 1), should_stop)
+        result = remove_loops(board, cancel_inverses(result))
+    if final_board(board, result) != final_board(board, moves):
+        # a hash collision, very unlikely: keep the safe part
+        return cancel_inverses(moves)
+    return result
+
+
+def optimize_names(board, moves, window=None) -> list:
+    '''
+        optimize for move names: 'left', 'up', ...
+    '''
+    return decode_moves(optimize(board, encode_moves(moves), window))
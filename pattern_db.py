@@ -0,0 +1,384 @@
+'''
+    Additive pattern databases
+
+    The tiles are split into disjoint groups. For every group a table stores,
+    for every placement of its tiles, how many moves of these tiles are needed
+    to bring them home. The sum of the groups is an admissible heuristic.
+
+    The tables are built by backward breadth-first search from the solved board,
+    in parallel (one process per group) and saved into one file per board size
+    next to the game (pdb_<rows>x<cols>.bin). Later runs memory-map the file,
+    so they start instantly.
+
+    Placements are indexed densely: the i_th tile of the group in cell p adds
+    p * (rows*cols)**i to the index, so a move changes the index by a constant
+    and the search updates it in O(1).
+
+    Only moves of the group's own tiles are counted, the BLANK moves freely
+    between the other tiles. A table has (rows*cols)**(group size) entries,
+    so only boards whose tables stay under MAX_TABLE_ENTRIES are supported
+    (up to 5x5 and 4x6 with the default groups), see supports().
+
+    Usage: python pattern_db.py -d rows,cols [-j jobs]
+'''
+
+import numpy as np
+import os
+import struct
+import sys
+from getopt import getopt
+from sys import argv
+from board_state import BoardState, MOVES, move_tables
+from ida_star import Cancelled, FOUND
+
+
+DATABASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MAGIC = b'PDB2'
+UNKNOWN = 255
+BFS_CHUNK = 1 << 18
+
+# Tile groups, the BLANK is the last tile and is never in a group
+DEFAULT_PATTERNS = {
+    # 6-6-3
+    (4, 4): ((0, 1, 3, 4, 7, 8), (2, 5, 6, 9, 10, 14), (11, 12, 13)),
+    # 5-5-5-5-4, a dense 6 tile table of a 5x5 board would be 25**6 bytes = 244 MB
+    (5, 5): ((0, 1, 2, 5, 6), (3, 4, 7, 8, 9), (10, 11, 15, 16, 20),
+             (12, 13, 14, 17, 18), (19, 21, 22, 23)),
+}
+# Groups for the other sizes are cut from the tiles in order
+MAX_GROUP_SIZE = 5
+# Entries of one table at most, a table builds in 9 bytes per entry (the BFS keeps a uint64 mask each),
+# in one process per group
+MAX_TABLE_ENTRIES = 1 << 24
+# The BFS masks are uint64
+MAX_CELLS = 64
+
+
+def default_patterns(rows, cols) -> tuple:
+    if (rows, cols) in DEFAULT_PATTERNS:
+        return DEFAULT_PATTERNS[(rows, cols)]
+    tiles = list(range(rows * cols - 1))
+    return tuple(tuple(tiles[i:i+MAX_GROUP_SIZE]) for i in range(0, len(tiles), MAX_GROUP_SIZE))
+
+
+def supports(rows, cols, patterns=None) -> bool:
+    patterns = default_patterns(rows, cols) if patterns is None else patterns
+    return rows >= 2 and cols >= 2 and rows * cols <= MAX_CELLS and \
+        all((rows * cols) ** len(group) <= MAX_TABLE_ENTRIES for group in patterns)
+
+
+def database_path(rows, cols) -> str:
+    return os.path.join(DATABASE_DIR, f'pdb_{rows}x{cols}.bin')
+
+
+def neighbor_table(rows, cols):
+    '''
+        returns an array, [cell, direction] is the neighboring cell or -1
+    '''
+    return np.array(move_tables(rows, cols).target, dtype=np.int64).reshape(-1, len(MOVES))
+
+
+def build_table(rows, cols, tiles):
+    '''
+        Backward BFS from the solved placement of the tiles.
+        returns an uint8 array of (rows*cols)**len(tiles) entries
+
+        The BFS runs over placements, and keeps the cells the BLANK can be in as a
+        bit mask, so the BLANK moving between the other tiles costs nothing
+        and a step of the group's tiles costs one move.
+    '''
+    size = rows * cols
+    powers = size ** np.arange(len(tiles), dtype=np.int64)
+    neighbors = neighbor_table(rows, cols)
+    bits = np.left_shift(np.uint64(1), np.arange(size, dtype=np.uint64))
+
+    table = np.full(size ** len(tiles), UNKNOWN, dtype=np.uint8)
+    # visited[index]: the BLANK cells already reached with this placement
+    visited = np.zeros(size ** len(tiles), dtype=np.uint64)
+    frontier = np.array([np.dot(tiles, powers)], dtype=np.int64)
+    masks = bits[[size - 1]]
+    depth = 0
+
+    while frontier.size:
+        new_frontier, new_masks = [], []
+        for start in range(0, frontier.size, BFS_CHUNK):
+            index = frontier[start:start+BFS_CHUNK]
+            positions = index[:, None] // powers % size
+            occupied = np.bitwise_or.reduce(bits[positions], axis=1)
+            # Every cell the BLANK reaches for free, minus the ones seen before
+            mask = blank_region(masks[start:start+BFS_CHUNK], ~occupied, rows, cols)
+            mask &= ~visited[index]
+            visited[index] |= mask
+            table[index[table[index] == UNKNOWN]] = depth
+
+            for i in range(len(tiles)):
+                for direction in range(len(MOVES)):
+                    # The tile slides into the BLANK next to it, the BLANK takes its place
+                    target = neighbors[positions[:, i], direction]
+                    can_move = target >= 0
+                    can_move[can_move] = (mask[can_move] & bits[target[can_move]]) != 0
+                    moved = index[can_move] + \
+                        (target[can_move] - positions[can_move, i]) * powers[i]
+                    blank_mask = bits[positions[can_move, i]]
+                    keep = (blank_mask & ~visited[moved]) != 0
+                    new_frontier.append(moved[keep])
+                    new_masks.append(blank_mask[keep])
+
+        frontier = np.concatenate(new_frontier)
+        masks = np.concatenate(new_masks)
+        # Merge the BLANK cells of the same placement
+        order = np.argsort(frontier, kind='stable')
+        frontier, masks = frontier[order], masks[order]
+        starts = np.flatnonzero(np.r_[True, frontier[1:] != frontier[:-1]]) \
+            if frontier.size else np.zeros(0, dtype=np.int64)
+        masks = np.bitwise_or.reduceat(masks, starts) if frontier.size else masks
+        frontier = frontier[starts]
+        depth += 1
+
+    return table
+
+
+def blank_region(masks, free, rows, cols):
+    '''
+        Flood fills the masks inside the free cells
+    '''
+    size = rows * cols
+    full = np.uint64((1 << size) - 1)
+    first_col = np.uint64(sum(1 << (x * cols) for x in range(rows)))
+    last_col = np.uint64(sum(1 << (x * cols + cols - 1) for x in range(rows)))
+    one, width = np.uint64(1), np.uint64(cols)
+    free = free & full
+    masks = masks & free
+    while True:
+        grown = masks | ((masks & ~last_col) << one) | ((masks & ~first_col) >> one) \
+            | ((masks << width) & full) | (masks >> width)
+        grown &= free
+        if np.array_equal(grown, masks):
+            return masks
+        masks = grown
+
+
+def build_database(rows, cols, patterns=None, jobs=None):
+    '''
+        Builds the tables of every group in parallel and writes the file,
+        one after the other in a daemon process (a worker of a pool), which cannot start processes
+        returns the path of the file
+    '''
+    patterns = default_patterns(rows, cols) if patterns is None else patterns
+    check_patterns(rows, cols, patterns)
+
+    import multiprocessing  # only for building, it slows down the startup
+    if multiprocessing.current_process().daemon:
+        tables = [build_table(rows, cols, group) for group in patterns]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            tables = list(pool.map(build_table, [rows] * len(patterns),
+                                   [cols] * len(patterns), patterns))
+
+    path = database_path(rows, cols)
+    temporary = f'{path}.{os.getpid()}.tmp'  # other processes may build the same file
+    with open(temporary, 'wb') as f:
+        f.write(encode_header(rows, cols, patterns))
+        for table in tables:
+            f.write(table.tobytes())
+    os.replace(temporary, path)
+    return path
+
+
+def check_patterns(rows, cols, patterns):
+    tiles = sorted(tile for group in patterns for tile in group)
+    if tiles != list(range(rows * cols - 1)):
+        raise ValueError(
+            'The groups have to contain every tile except the BLANK exactly once')
+    if not supports(rows, cols, patterns):
+        raise ValueError(f'The pattern database of a {rows}x{cols} board would be too big, '
+                         f'a table has at most {MAX_TABLE_ENTRIES} entries')
+
+
+def encode_header(rows, cols, patterns) -> bytes:
+    '''
+        magic, rows, cols, number of groups, then for each group its size and tiles,
+        padded to 8 bytes
+    '''
+    header = MAGIC + struct.pack('<HHH', rows, cols, len(patterns))
+    for group in patterns:
+        header += struct.pack(f'<H{len(group)}H', len(group), *group)
+    return header + bytes(-len(header) % 8)
+
+
+def read_header(f):
+    '''
+        returns rows, cols, patterns and the offset of the first table
+    '''
+    if f.read(4) != MAGIC:
+        raise ValueError('Not a pattern database file')
+    rows, cols, count = struct.unpack('<HHH', f.read(6))
+    patterns = []
+    for _ in range(count):
+        size, = struct.unpack('<H', f.read(2))
+        patterns.append(struct.unpack(f'<{size}H', f.read(2 * size)))
+    offset = f.tell()
+    return rows, cols, tuple(patterns), offset + (-offset % 8)
+
+
+def load_database(rows, cols, build=True, jobs=None):
+    '''
+        Memory-maps the database of the board size, builds it first if there is none
+        returns (patterns, tables), tables are read only memmaps
+    '''
+    path = database_path(rows, cols)
+    if not os.path.exists(path):
+        if not build:
+            raise FileNotFoundError(path)
+        build_database(rows, cols, jobs=jobs)
+
+    with open(path, 'rb') as f:
+        file_rows, file_cols, patterns, offset = read_header(f)
+    if (file_rows, file_cols) != (rows, cols):
+        raise ValueError(f'{path} is for a {file_rows}x{file_cols} board')
+
+    tables = []
+    for group in patterns:
+        length = (rows * cols) ** len(group)
+        tables.append(np.memmap(path, dtype=np.uint8, mode='r',
+                                offset=offset, shape=(length,)))
+        offset += length
+    return patterns, tables
+
+
+class PatternIDAStar:
+    '''
+        IDA* with the additive pattern database heuristic.
+        The index of every group is updated incrementally, as the heuristic.
+    '''
+
+    def __init__(self, rows, cols, build=True, jobs=None):
+        self.rows = rows
+        self.cols = cols
+        size = rows * cols
+        self.blank = size - 1
+        self.patterns, tables = load_database(rows, cols, build, jobs)
+        # memoryviews are indexed much faster than memmaps
+        self.tables = [memoryview(table) for table in tables]
+
+        # group_of[tile], step_of[tile]: the index of the group changes by step * (new cell - old cell)
+        self.group_of = [0] * size
+        self.step_of = [0] * size
+        for number, group in enumerate(self.patterns):
+            for slot, tile in enumerate(group):
+                self.group_of[tile] = number
+                self.step_of[tile] = size ** slot
+
+        self.neighbors = move_tables(rows, cols).moves_from
+
+    def indexes(self, board) -> list:
+        indexes = [0] * len(self.patterns)
+        for cell, tile in enumerate(board):
+            if tile != self.blank:
+                indexes[self.group_of[tile]] += self.step_of[tile] * cell
+        return indexes
+
+    def heuristic(self, board) -> int:
+        return sum(table[index] for table, index in zip(self.tables, self.indexes(board)))
+
+    def solve(self, board, should_stop=None) -> list:
+        '''
+            board: 2D board (numpy array or nested lists)
+            returns the shortest list of moves, None if cancelled
+        '''
+        state = BoardState.from_board(board)
+        board = state.tiles
+        blank = self.blank
+        neighbors = self.neighbors
+        tables = self.tables
+        group_of, step_of = self.group_of, self.step_of
+        indexes = self.indexes(board)
+
+        path = []
+        length = 0
+        nodes = 0
+
+        def search(g, bound, blank_cell, prev, h):
+            nonlocal nodes, length
+            f = g + h
+            if f > bound:
+                return f
+            if h == 0:
+                length = g
+                return FOUND
+            nodes += 1
+            if should_stop is not None and not nodes & 0xfff and should_stop():
+                raise Cancelled
+            minimum = 1 << 30
+            for move, cell in neighbors[blank_cell]:
+                if move == prev ^ 1:
+                    continue
+                tile = board[cell]
+                # The tile slides from cell to blank_cell
+                group = group_of[tile]
+                table = tables[group]
+                old_index = indexes[group]
+                new_index = old_index + step_of[tile] * (blank_cell - cell)
+                indexes[group] = new_index
+                board[blank_cell], board[cell] = tile, blank
+                path[g] = move
+                result = search(g + 1, bound, cell, move,
+                                h - table[old_index] + table[new_index])
+                board[blank_cell], board[cell] = blank, tile
+                indexes[group] = old_index
+                if result == FOUND:
+                    return FOUND
+                if result < minimum:
+                    minimum = result
+            return minimum
+
+        bound = self.heuristic(board)
+        blank_cell = state.blank_cell
+        try:
+            while True:
+                path.extend([None] * (bound + 1 - len(path)))
+                result = search(0, bound, blank_cell, -2, self.heuristic(board))
+                if result == FOUND:
+                    return [MOVES[move] for move in path[:length]]
+                bound = result
+        except Cancelled:
+            return None
+
+
+# One searcher per board size, so the database is mapped only once
+SEARCHERS = {}
+
+
+def solve_pattern_db(board, should_stop=None) -> list:
+    '''
+        Returns a shortest list of moves solving the board, the board is not changed.
+        Builds the database of the board size on the first call.
+    '''
+    rows, cols = len(board), len(board[0])
+    if not supports(rows, cols):
+        raise ValueError(f'The pdb method only solves boards up to 5x5 and 4x6, not {rows}x{cols}')
+    if (rows, cols) not in SEARCHERS:
+        SEARCHERS[(rows, cols)] = PatternIDAStar(rows, cols)
+    return SEARCHERS[(rows, cols)].solve(board, should_stop)
+
+
+def main():
+    rows, cols = 4, 4
+    jobs = None
+    opts, _ = getopt(argv[1:], "d:j:", ["dimensions=", "jobs="])
+    for opt, val in opts:
+        if opt in ("--dimensions", "-d"):
+            rows, cols = tuple(map(int, val.split(',')))
+        elif opt in ("--jobs", "-j"):
+            jobs = int(val)
+
+    try:
+        path = build_database(rows, cols, jobs=jobs)
+    except ValueError as error:
+        sys.exit(str(error))
+    print(f'{rows}x{cols} pattern database written to {path}')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
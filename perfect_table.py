@@ -0,0 +1,205 @@
+'''
+    Perfect tables of small boards
+
+    Boards of at most 9 cells (2x2, 2x3, 2x4, 3x3, ...) have few enough states
+    to store the distance of every one from the solved board. The table is
+    built once by breadth-first search from the solved board, moving all the
+    boards of a BFS layer at once (see vectorized.py), and saved next to the
+    game (perfect_<rows>x<cols>.bin).
+
+    States are indexed by the Lehmer code of the tiles (rank of the permutation).
+    Only the distance modulo 3 is stored, 2 bits per state (3: not reachable):
+    a move changes the distance by exactly one, so the neighbor one step closer
+    is the one with (distance - 1) % 3, and walking down these gives an optimal
+    solution. A 3x3 table is 9!/4 bytes = 89 KB.
+
+    Usage: python perfect_table.py -d rows,cols
+'''
+
+import numpy as np
+import os
+import struct
+import sys
+from getopt import getopt
+from math import factorial
+from sys import argv
+from board_state import BoardState, MOVES
+from vectorized import apply_moves, blank_cells
+
+
+TABLE_DIR = os.path.dirname(os.path.abspath(__file__))
+MAGIC = b'PRF1'
+HEADER = struct.Struct('<4sHH')
+MAX_CELLS = 9
+UNREACHABLE = 3
+
+
+def supports(rows, cols) -> bool:
+    return rows >= 2 and cols >= 2 and rows * cols <= MAX_CELLS
+
+
+def table_path(rows, cols) -> str:
+    return os.path.join(TABLE_DIR, f'perfect_{rows}x{cols}.bin')
+
+
+def rank(tiles) -> int:
+    '''
+        Lehmer code of a permutation of 0..n-1, O(n) with a bit mask of the tiles seen
+    '''
+    size = len(tiles)
+    used = 0
+    result = 0
+    for i, tile in enumerate(tiles):
+        smaller = tile - (used & ((1 << tile) - 1)).bit_count()
+        result += smaller * factorial(size - 1 - i)
+        used |= 1 << tile
+    return result
+
+
+def rank_boards(flat):
+    '''
+        Lehmer codes of every row of a (K, n) array
+    '''
+    count, size = flat.shape
+    ranks = np.zeros(count, dtype=np.int64)
+    for i in range(size - 1):
+        smaller = np.count_nonzero(flat[:, i+1:] < flat[:, i:i+1], axis=1)
+        ranks += smaller * factorial(size - 1 - i)
+    return ranks
+
+
+def build_table(rows, cols):
+    '''
+        returns the distance modulo 3 of every rank, UNREACHABLE for the other half
+    '''
+    size = rows * cols
+    distance = np.full(factorial(size), UNREACHABLE, dtype=np.uint8)
+    frontier = np.arange(size, dtype=np.uint8).reshape(1, rows, cols)
+    distance[0] = 0
+    depth = 0
+
+    while len(frontier):
+        depth += 1
+        found = []
+        for move in range(len(MOVES)):
+            boards = frontier.copy()
+            made = apply_moves(boards, blank_cells(boards), np.full(len(boards), move))
+            boards = boards[made]
+            ranks = rank_boards(boards.reshape(-1, size))
+            new = distance[ranks] == UNREACHABLE
+            ranks, first = np.unique(ranks[new], return_index=True)
+            distance[ranks] = depth % 3
+            found.append(boards[new][first])
+        frontier = np.ascontiguousarray(np.concatenate(found))
+    return distance
+
+
+def pack(values):
+    '''
+        4 values of 2 bits per byte, the first in the lowest bits
+    '''
+    values = np.concatenate((values, np.zeros(-len(values) % 4, dtype=np.uint8)))
+    return values[0::4] | values[1::4] << 2 | values[2::4] << 4 | values[3::4] << 6
+
+
+def build(rows, cols) -> str:
+    '''
+        Builds and writes the table
+        returns the path of the file
+    '''
+    if not supports(rows, cols):
+        raise ValueError(f'Perfect tables are only built up to {MAX_CELLS} cells')
+    path = table_path(rows, cols)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(HEADER.pack(MAGIC, rows, cols))
+        f.write(pack(build_table(rows, cols)).tobytes())
+    os.replace(path + '.tmp', path)
+    return path
+
+
+def load(rows, cols, build_missing=True) -> bytes:
+    '''
+        returns the packed table, builds it first if there is none
+    '''
+    path = table_path(rows, cols)
+    if not os.path.exists(path):
+        if not build_missing:
+            raise FileNotFoundError(path)
+        build(rows, cols)
+    with open(path, 'rb') as f:
+        magic, file_rows, file_cols = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or (file_rows, file_cols) != (rows, cols):
+            raise ValueError(f'{path} is not the perfect table of a {rows}x{cols} board')
+        return f.read()
+
+
+class PerfectTable:
+    def __init__(self, rows, cols, build_missing=True):
+        self.rows = rows
+        self.cols = cols
+        self.packed = load(rows, cols, build_missing)
+
+    def value(self, index) -> int:
+        return self.packed[index >> 2] >> ((index & 3) << 1) & 3
+
+    def solve(self, board) -> list:
+        '''
+            returns a shortest list of moves, raises ValueError if the board is not solvable
+        '''
+        state = BoardState.from_board(board)
+        tiles = state.tiles
+        index = rank(tiles)
+        value = self.value(index)
+        if value == UNREACHABLE:
+            raise ValueError('This board is not solvable')
+
+        moves = []
+        while index:
+            closer = (value - 1) % 3
+            for move in range(len(MOVES)):
+                if not state.is_valid(move):
+                    continue
+                state.make(move)
+                index = rank(tiles)
+                if self.value(index) == closer:
+                    break
+                state.undo(move)
+            moves.append(MOVES[move])
+            value = closer
+        return moves
+
+
+# One table per board size, read only once
+TABLES = {}
+
+
+def solve_perfect(board, should_stop=None) -> list:
+    '''
+        Returns a shortest list of moves solving a board of at most 9 cells, the board is not changed.
+        Builds the table of the board size on the first call.
+        should_stop is not used, a solve takes microseconds.
+    '''
+    rows, cols = len(board), len(board[0])
+    if not supports(rows, cols):
+        raise ValueError(f'The perfect method only solves boards up to {MAX_CELLS} cells')
+    if (rows, cols) not in TABLES:
+        TABLES[(rows, cols)] = PerfectTable(rows, cols)
+    return TABLES[(rows, cols)].solve(board)
+
+
+def main():
+    rows, cols = 3, 3
+    opts, _ = getopt(argv[1:], "d:", ["dimensions="])
+    for opt, val in opts:
+        if opt in ("--dimensions", "-d"):
+            rows, cols = tuple(map(int, val.split(',')))
+
+    try:
+        path = build(rows, cols)
+    except ValueError as error:
+        sys.exit(str(error))
+    print(f'{rows}x{cols} perfect table written to {path}')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,220 @@
+'''
+    Opt-in profiling of the solver and the game
+
+    Nothing is measured until enable() is called: it replaces the solver's
+    phases (methods of ConstructiveSolver), the solving methods and, with
+    instrument_game, the drawing functions of the game with timed wrappers.
+    Without it the code runs unchanged, so profiling costs nothing when off.
+
+    Every section counts its calls, the seconds spent in it (with the
+    sections called from it) and, for solver phases, the moves it made.
+    Each move_tile_to call is also recorded one by one. Frame times are the
+    times between two display updates, longer gaps are idle waits and are left out.
+    At exit the profile is written to a .json or .csv file.
+'''
+
+import atexit
+import csv
+import functools
+import inspect
+import json
+import time
+from array import array
+
+
+# Methods of ConstructiveSolver measured as phases
+PHASES = ('first_rows', 'last_rows', 'swap_in_col', 'order_66', 'finish_last_square',
+          'move_tile_to', 'move_blank_to')
+# Phases recorded call by call too
+DETAILED = ('move_tile_to',)
+# Drawing functions of the game
+GAME_SECTIONS = ('draw_board', 'draw_cells', 'draw_message', 'slide_animation', 'play_moves')
+# s, a longer gap between two display updates is not a frame
+FRAME_GAP = 0.5
+# Lines of the HUD
+HUD_SECTIONS = 8
+
+PROFILER = None
+
+
+class Section:
+    __slots__ = ('calls', 'seconds', 'max_seconds', 'moves')
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.moves = 0
+
+    def add(self, seconds, moves=0):
+        self.calls += 1
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.moves += moves
+
+
+class Profiler:
+    def __init__(self, path=None):
+        self.path = path
+        self.sections = {}
+        self.details = {name: [] for name in DETAILED}  # (seconds, moves) per call
+        self.frames = array('d')
+        self.last_update = None
+        self.hud = False
+
+    def section(self, name) -> Section:
+        if name not in self.sections:
+            self.sections[name] = Section()
+        return self.sections[name]
+
+    def wrap_phase(self, cls, name):
+        '''
+            Times a method of the solver and counts the moves it made.
+            Generator phases are timed only while they run, not while the moves are used.
+        '''
+        method = getattr(cls, name)
+        section = self.section(f'solver.{name}')
+        details = self.details.get(name)
+
+        if inspect.isgeneratorfunction(method):
+            @functools.wraps(method)
+            def timed(solver, *args, **kwargs):
+                moves = solver.move_count
+                seconds = 0.0
+                chunks = method(solver, *args, **kwargs)
+                while True:
+                    start = time.perf_counter()
+                    chunk = next(chunks, None)
+                    seconds += time.perf_counter() - start
+                    if chunk is None:
+                        break
+                    yield chunk
+                section.add(seconds, solver.move_count - moves)
+        else:
+            @functools.wraps(method)
+            def timed(solver, *args, **kwargs):
+                moves = solver.move_count
+                start = time.perf_counter()
+                result = method(solver, *args, **kwargs)
+                seconds = time.perf_counter() - start
+                moves = solver.move_count - moves
+                section.add(seconds, moves)
+                if details is not None:
+                    details.append((seconds, moves))
+                return result
+        setattr(cls, name, timed)
+
+    def wrap_function(self, namespace, name, section_name):
+        '''
+            Times a function of a module or a dict of functions
+        '''
+        is_dict = isinstance(namespace, dict)
+        function = namespace[name] if is_dict else getattr(namespace, name)
+        section = self.section(section_name)
+
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            result = function(*args, **kwargs)
+            section.add(time.perf_counter() - start)
+            return result
+        if is_dict:
+            namespace[name] = timed
+        else:
+            setattr(namespace, name, timed)
+
+    def frame(self):
+        now = time.perf_counter()
+        if self.last_update is not None and now - self.last_update < FRAME_GAP:
+            self.frames.append(now - self.last_update)
+        self.last_update = now
+
+    def frame_stats(self) -> dict:
+        if not self.frames:
+            return {'frames': 0}
+        ordered = sorted(self.frames)
+        mean = sum(ordered) / len(ordered)
+        return {'frames': len(ordered), 'mean_seconds': mean, 'fps': 1 / mean,
+                'median_seconds': ordered[len(ordered) // 2],
+                'p95_seconds': ordered[int(len(ordered) * 0.95)],
+                'max_seconds': ordered[-1]}
+
+    def summary(self) -> dict:
+        return {
+            'sections': {name: {'calls': section.calls, 'seconds': section.seconds,
+                                'max_seconds': section.max_seconds, 'moves': section.moves}
+                         for name, section in self.sections.items() if section.calls},
+            'calls': {name: [{'seconds': seconds, 'moves': moves} for seconds, moves in calls]
+                      for name, calls in self.details.items()},
+            'frames': self.frame_stats(),
+        }
+
+    def hud_lines(self) -> list:
+        '''
+            The slowest sections and the frame rate, for the game
+        '''
+        sections = sorted((item for item in self.sections.items() if item[1].calls),
+                          key=lambda item: item[1].seconds, reverse=True)[:HUD_SECTIONS]
+        lines = [f'{name}: {section.calls} calls, {section.seconds * 1000:.1f} ms'
+                 + (f', {section.moves} moves' if section.moves else '')
+                 for name, section in sections]
+        frames = self.frame_stats()
+        if frames['frames']:
+            lines.append(f'{frames["fps"]:.0f} fps, slowest frame {frames["max_seconds"] * 1000:.1f} ms')
+        return lines
+
+    def dump(self, path=None):
+        '''
+            Writes the profile as json, or as csv (one line per section) if the path ends in .csv
+        '''
+        path = path or self.path
+        if path.endswith('.csv'):
+            with open(path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(('section', 'calls', 'seconds', 'max_seconds', 'moves'))
+                for name, section in self.sections.items():
+                    if section.calls:
+                        writer.writerow((name, section.calls, section.seconds,
+                                         section.max_seconds, section.moves))
+                stats = self.frame_stats()
+                if stats['frames']:
+                    writer.writerow(('frame', stats['frames'], stats['mean_seconds'] * stats['frames'],
+                                     stats['max_seconds'], 0))
+        else:
+            with open(path, 'w') as f:
+                json.dump(self.summary(), f, indent=2)
+
+
+def enable(path=None) -> Profiler:
+    '''
+        Starts profiling the solvers, the profile is written to path at exit
+    '''
+    global PROFILER
+    if PROFILER is not None:
+        return PROFILER
+    import solver
+
+    PROFILER = Profiler(path)
+    for name in PHASES:
+        PROFILER.wrap_phase(solver.ConstructiveSolver, name)
+    PROFILER.wrap_function(solver, 'optimize', 'solver.optimize')
+    for method in list(solver.SOLVERS):
+        PROFILER.wrap_function(solver.SOLVERS, method, f'solve.{method}')
+    if path:
+        atexit.register(PROFILER.dump)
+    return PROFILER
+
+
+def instrument_game(game, display):
+    '''
+        Times the drawing functions of the game module and the frames (pygame.display.update)
+    '''
+    for name in GAME_SECTIONS:
+        PROFILER.wrap_function(game, name, f'game.{name}')
+    update = display.update
+
+    @functools.wraps(update)
+    def timed_update(*args):
+        update(*args)
+        PROFILER.frame()
+    display.update = timed_update
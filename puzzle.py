@@ -0,0 +1,254 @@
+'''
+    Checking and generating boards
+
+    A board is solvable if and only if the parity of its permutation equals the
+    parity of the BLANK's distance from the bottom right corner: every move is
+    one transposition and moves the BLANK by one cell.
+
+    Usage: python puzzle.py -d rows,cols -n count -o directory [--seed S] [--scramble K]
+           [--band low,high]
+    writes the boards as csv files, in the format of solvable_board.csv,
+    or into one board dataset if the output ends in .brd (see dataset.py)
+'''
+
+import numpy as np
+import os
+import sys
+from getopt import getopt
+from sys import argv
+from vectorized import scramble
+
+
+# Boards are generated in rounds of this size when filtering for a band
+GENERATE_CHUNK = 1 << 16
+# Cells of the boards tried for a band before giving up, at least one round of GENERATE_CHUNK boards
+MAX_BAND_CELLS = 1 << 24
+
+
+def validate_boards(boards):
+    '''
+        Raises ValueError if a board is not a permutation of 0..rows*cols-1
+        boards: one 2D board or a (K, rows, cols) stack
+    '''
+    boards = np.asarray(boards)
+    if boards.ndim not in (2, 3) or 0 in boards.shape:
+        raise ValueError(f'Expected a 2D board or a stack of boards, got shape {boards.shape}')
+    size = boards.shape[-1] * boards.shape[-2]
+    bad = invalid_boards(boards.reshape(-1, size))
+    if bad.size:
+        raise ValueError(
+            f'Board {bad[0]} is not a permutation of 0..{size - 1}' if boards.ndim == 3
+            else f'The board is not a permutation of 0..{size - 1}')
+
+
+def invalid_boards(flat):
+    '''
+        Indices of the rows of a (K, n) array that are not permutations of 0..n-1
+    '''
+    return np.flatnonzero(np.any(np.sort(flat, axis=1) != np.arange(flat.shape[1]), axis=1))
+
+
+def permutation_parity(tiles) -> int:
+    '''
+        Parity of a flat board by cycle decomposition, O(n)
+    '''
+    seen = bytearray(len(tiles))
+    parity = 0
+    for start in range(len(tiles)):
+        if seen[start]:
+            continue
+        cell = start
+        while not seen[cell]:
+            seen[cell] = 1
+            cell = tiles[cell]
+            parity ^= 1
+        parity ^= 1  # a cycle of length l is l-1 transpositions
+    return parity
+
+
+def stack_parity(flat):
+    '''
+        Parity of every row of a (K, n) array, n vectorized steps:
+        step i swaps the tile i into cell i where it is not there yet
+    '''
+    count, size = flat.shape
+    perm = flat.astype(np.intp)
+    inverse = np.empty_like(perm)
+    rows = np.arange(count)[:, None]
+    inverse[rows, perm] = np.arange(size)
+    parity = np.zeros(count, dtype=bool)
+    for i in range(size):
+        cell = inverse[:, i]
+        wrong = np.flatnonzero(cell != i)
+        if not wrong.size:
+            continue
+        cell = cell[wrong]
+        tile = perm[wrong, i]
+        perm[wrong, cell] = tile
+        perm[wrong, i] = i
+        inverse[wrong, tile] = cell
+        inverse[wrong, i] = i
+        parity[wrong] ^= True
+    return parity
+
+
+def is_solvable(boards, validate=True):
+    '''
+        boards: one 2D board, or a (K, rows, cols) stack
+        returns a bool for one board, a bool array for a stack
+    '''
+    boards = np.asarray(boards)
+    if validate:
+        validate_boards(boards)
+    rows, cols = boards.shape[-2:]
+    blank = rows * cols - 1
+
+    if boards.ndim == 2:
+        tiles = [int(tile) for tile in boards.flat]
+        blank_x, blank_y = divmod(tiles.index(blank), cols)
+        distance = rows - 1 - blank_x + cols - 1 - blank_y
+        return permutation_parity(tiles) == distance % 2
+
+    flat = boards.reshape(len(boards), -1)
+    blank_x, blank_y = np.divmod(np.argmax(flat == blank, axis=1), cols)
+    distance = rows - 1 - blank_x + cols - 1 - blank_y
+    return stack_parity(flat) == (distance % 2).astype(bool)
+
+
+def board_dtype(rows, cols):
+    return np.uint8 if rows * cols <= 256 else np.uint16
+
+
+def generate_puzzles(count, rows, cols, seed=None, scramble=None, band=None):
+    '''
+        Returns a (count, rows, cols) array of solvable boards
+        seed: anything np.random.default_rng accepts, the same seed gives the same boards
+        scramble: if given, every board is a random walk of this many moves from the
+            solved board (no move undoes the previous one), else a uniformly random board
+            with the BLANK in the bottom right corner
+        band: (low, high), only boards with low <= Manhattan distance <= high
+            raises ValueError if the band is out of reach, or MAX_BAND_CELLS cells of boards
+            do not give enough boards in it
+    '''
+    rng = np.random.default_rng(seed)
+    if band is None:
+        return _generate(rng, count, rows, cols, scramble)
+
+    low, high = band
+    reach = max_manhattan_distance(rows, cols)
+    if scramble is not None:
+        reach = min(reach, scramble)  # a move changes the distance by 1
+    if low > high or low > reach:
+        raise ValueError(f'No {rows}x{cols} board is in the band {low}..{high}, '
+                         f'the largest Manhattan distance is at most {reach}')
+    found = []
+    missing = count
+    tried = 0
+    for _ in range(max(1, MAX_BAND_CELLS // (GENERATE_CHUNK * rows * cols))):
+        boards = _generate(rng, max(missing, GENERATE_CHUNK), rows, cols, scramble)
+        tried += len(boards)
+        distance = manhattan_distance(boards)
+        boards = boards[(low <= distance) & (distance <= high)][:missing]
+        found.append(boards)
+        missing -= len(boards)
+        if not missing:
+            return np.concatenate(found)
+    raise ValueError(f'Only {count - missing} of {count} boards were found in the band {low}..{high} '
+                     f'among {tried} random boards, try a wider band')
+
+
+def _generate(rng, count, rows, cols, scramble):
+    if scramble is not None:
+        return random_walk(rng, count, rows, cols, scramble)
+
+    size = rows * cols
+    tiles = rng.permuted(np.tile(np.arange(size - 1, dtype=board_dtype(rows, cols)),
+                                 (count, 1)), axis=1)
+    # The BLANK is at home, so the permutation has to be even: one swap fixes the odd ones
+    odd = np.flatnonzero(stack_parity(tiles))
+    tiles[odd, 0], tiles[odd, 1] = tiles[odd, 1], tiles[odd, 0].copy()
+    blank = np.full((count, 1), size - 1, dtype=tiles.dtype)
+    return np.hstack((tiles, blank)).reshape(count, rows, cols)
+
+
+def random_walk(rng, count, rows, cols, length):
+    '''
+        Moves the BLANK of count solved boards randomly, all boards in one step
+    '''
+    boards = np.tile(np.arange(rows * cols, dtype=board_dtype(rows, cols)), (count, 1))
+    boards = boards.reshape(count, rows, cols)
+    scramble(boards, np.full(count, rows * cols - 1), length, rng)
+    return boards
+
+
+def manhattan_distance(boards):
+    '''
+        Sum of the distances of the tiles from home, for a (K, rows, cols) stack
+    '''
+    count, rows, cols = boards.shape
+    flat = boards.reshape(count, -1).astype(np.intp)
+    cells = np.arange(rows * cols)
+    distance = np.abs(flat // cols - cells // cols) + np.abs(flat % cols - cells % cols)
+    distance[flat == rows * cols - 1] = 0
+    return distance.sum(axis=1)
+
+
+def max_manhattan_distance(rows, cols) -> int:
+    '''
+        An upper bound of the Manhattan distance: every tile on the cell farthest from home
+    '''
+    row, col = np.divmod(np.arange(rows * cols - 1), cols)
+    return int(np.sum(np.maximum(row, rows - 1 - row) + np.maximum(col, cols - 1 - col)))
+
+
+def write_boards(boards, directory):
+    '''
+        Writes every board into its own csv file
+    '''
+    os.makedirs(directory, exist_ok=True)
+    digits = len(str(len(boards) - 1))
+    for number, board in enumerate(boards):
+        np.savetxt(os.path.join(directory, f'board_{number:0{digits}d}.csv'),
+                   board, fmt='%d', delimiter=', ')
+
+
+def main(args=None):
+    '''
+        args: the command line arguments, sys.argv[1:] if not given
+    '''
+    rows, cols = 4, 4
+    count = 1
+    directory = None
+    seed = scramble = band = None
+    opts, _ = getopt(argv[1:] if args is None else args, "d:n:o:", [
+                     "dimensions=", "count=", "output=", "seed=", "scramble=", "band="])
+    for opt, val in opts:
+        if opt in ("--dimensions", "-d"):
+            rows, cols = tuple(map(int, val.split(',')))
+        elif opt in ("--count", "-n"):
+            count = int(val)
+        elif opt in ("--output", "-o"):
+            directory = val
+        elif opt == "--seed":
+            seed = int(val)
+        elif opt == "--scramble":
+            scramble = int(val)
+        elif opt == "--band":
+            band = tuple(map(int, val.split(',')))
+
+    if directory is None:
+        sys.exit('The output directory (-o) is required')
+    try:
+        boards = generate_puzzles(count, rows, cols, seed, scramble, band)
+    except ValueError as error:
+        sys.exit(str(error))
+    if directory.endswith('.brd'):
+        from dataset import write_dataset  # dataset.py imports this module
+        write_dataset(directory, boards)
+    else:
+        write_boards(boards, directory)
+    print(f'{count} boards written to {directory}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+'''
+    Persistent solution cache
+
+    Solutions are kept in one sqlite file next to the game (solutions.sqlite),
+    keyed by a hash of the board (its size and tiles) and the solving method.
+    The moves are packed 2 bits each, like in the solution files. The last
+    used solutions are also kept in memory.
+
+    A solution shorter than the stored one replaces it, a longer one is
+    ignored. The file holds at most max_bytes of moves, the solutions used
+    least recently are dropped first.
+    The anytime method is not cached, its result depends on the time budget.
+    The use times of the hits are written in batches (flush), and the bytes
+    stored are counted as the solutions come instead of summed on every put.
+
+    Usage: python solution_cache.py [--clear]  (prints the size of the cache)
+'''
+
+import atexit
+import hashlib
+import numpy as np
+import os
+import sqlite3
+import struct
+import sys
+import threading
+import time
+from collections import OrderedDict
+from getopt import getopt
+from sys import argv
+from solution_io import pack_moves, unpack_moves
+from solver import SOLVERS
+
+
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'solutions.sqlite')
+MAX_BYTES = 64 << 20
+# Solutions kept in memory
+MEMORY_ENTRIES = 256
+# Hits whose use times are kept before they are written
+USED_FLUSH = 256
+# Puts between two recounts of the bytes stored, other processes (batch.py) store solutions too
+RECOUNT_PUTS = 1024
+# s, how long a process waits while another one writes the file (batch.py)
+LOCK_TIMEOUT = 30
+UNCACHED = ('anytime',)
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS solutions (
+        key BLOB, method TEXT, length INTEGER, moves BLOB, used REAL,
+        PRIMARY KEY (key, method)) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS solutions_used ON solutions (used);
+'''
+
+
+def board_key(board) -> bytes:
+    '''
+        Hash of the size and the tiles, the same for a list or any int array of the board
+    '''
+    tiles = np.asarray(board)
+    rows, cols = tiles.shape
+    dtype = '<u2' if rows * cols > 256 else 'u1'
+    data = struct.pack('<HH', rows, cols) + tiles.astype(dtype).tobytes()
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+class SolutionCache:
+    '''
+        with SolutionCache() as cache:
+            moves = cache.solve(board, 'optimal')
+        Can be used from the solving thread of the game, one call at a time.
+    '''
+
+    def __init__(self, path=CACHE_PATH, max_bytes=MAX_BYTES, memory_entries=MEMORY_ENTRIES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self.memory = OrderedDict()  # (key, method) -> (length, packed moves)
+        self.used = {}  # (key, method) -> the last use not written yet
+        self.lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.puts = 0
+        self.connection = sqlite3.connect(path, timeout=LOCK_TIMEOUT, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')  # batch workers read while one writes
+        self.connection.execute('PRAGMA synchronous=NORMAL')  # a lost solution is only solved again
+        self.connection.executescript(SCHEMA)
+        self.total = self.size()  # bytes of moves stored, a replaced solution is counted until the recount
+        atexit.register(self.close)
+
+    def remember(self, entry, solution):
+        self.memory[entry] = solution
+        self.memory.move_to_end(entry)
+        if len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def get(self, board, method):
+        '''
+            returns the stored moves (names) or None
+        '''
+        entry = (board_key(board), method)
+        with self.lock:
+            solution = self.memory.get(entry)
+            if solution is None:
+                solution = self.connection.execute(
+                    'SELECT length, moves FROM solutions WHERE key = ? AND method = ?', entry).fetchone()
+            if solution is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.used[entry] = time.time()
+            if len(self.used) >= USED_FLUSH:
+                self.flush()
+            self.remember(entry, solution)
+        return unpack_moves(solution[1], solution[0])
+
+    def put(self, board, method, moves) -> bool:
+        '''
+            Stores the moves if there is no shorter solution stored
+            returns whether they were stored
+        '''
+        entry = (board_key(board), method)
+        solution = (len(moves), pack_moves(moves))
+        with self.lock, self.connection:
+            stored = self.connection.execute('''
+                INSERT INTO solutions VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (key, method) DO UPDATE
+                SET length = excluded.length, moves = excluded.moves, used = excluded.used
+                WHERE excluded.length < solutions.length''', (*entry, *solution, time.time())).rowcount
+            if stored:
+                self.remember(entry, solution)
+                self.total += len(solution[1])
+                self.puts += 1
+                if self.total > self.max_bytes or not self.puts % RECOUNT_PUTS:
+                    self.evict()
+        return bool(stored)
+
+    def flush(self):
+        '''
+            Writes the use times of the hits
+        '''
+        with self.lock:
+            if not self.used:
+                return
+            with self.connection:
+                self.connection.executemany('UPDATE solutions SET used = ? WHERE key = ? AND method = ?',
+                                            [(used, *entry) for entry, used in self.used.items()])
+            self.used.clear()
+
+    def size(self) -> int:
+        '''
+            bytes of moves stored
+        '''
+        return int(self.connection.execute('SELECT total(length(moves)) FROM solutions').fetchone()[0])
+
+    def evict(self):
+        '''
+            Drops the least recently used solutions until the moves fit in max_bytes
+        '''
+        self.flush()
+        self.total = self.size()
+        excess = self.total - self.max_bytes
+        if excess <= 0:
+            return
+        dropped = []
+        for key, method, size in self.connection.execute(
+                'SELECT key, method, length(moves) FROM solutions ORDER BY used').fetchall():
+            dropped.append((key, method))
+            excess -= size
+            self.total -= size
+            if excess <= 0:
+                break
+        self.connection.executemany('DELETE FROM solutions WHERE key = ? AND method = ?', dropped)
+        for entry in dropped:
+            self.memory.pop(entry, None)
+
+    def solve(self, board, method, should_stop=None, **options):
+        '''
+            The stored solution, or solves the board with SOLVERS[method] and stores the moves
+            returns None if the solve was stopped
+        '''
+        if method in UNCACHED:
+            return SOLVERS[method](board, should_stop=should_stop, **options)
+        moves = self.get(board, method)
+        if moves is None:
+            moves = SOLVERS[method](board, should_stop=should_stop, **options)
+            if moves is not None:
+                self.put(board, method, moves)
+        return moves
+
+    def clear(self):
+        with self.lock, self.connection:
+            self.connection.execute('DELETE FROM solutions')
+            self.memory.clear()
+            self.used.clear()
+            self.total = 0
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main():
+    opts, _ = getopt(argv[1:], "", ["clear"])
+    with SolutionCache() as cache:
+        if ("--clear", "") in opts:
+            cache.clear()
+        count = cache.connection.execute('SELECT count(*) FROM solutions').fetchone()[0]
+        print(f'{count} solutions, {cache.size()} bytes of moves in {cache.path}')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
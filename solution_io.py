@@ -0,0 +1,183 @@
+'''
+    Compact solution files
+
+    Layout (little endian):
+        b'SLV1', rows (uint16), cols (uint16), number of moves (uint64),
+        the start board row by row (uint8, or uint16 above 256 cells),
+        the moves, 2 bits each, 4 moves per byte, the first move in the lowest bits.
+    Move codes are the ones of board_state: 0 left, 1 right, 2 up, 3 down.
+
+    The writer appends the moves as they come and writes the number of moves
+    when it is closed, the reader yields the moves chunk by chunk, so neither
+    has to hold the whole solution. Files in the old format (the repr of a list
+    of move names, like solution.txt) can be read too.
+'''
+
+import ast
+import struct
+from board_state import MOVE_CODES, decode_moves
+
+
+MAGIC = b'SLV1'
+HEADER = struct.Struct('<4sHHQ')
+COUNT_OFFSET = 8
+# Bytes read at once, 4 moves each
+READ_CHUNK = 1 << 16
+# DECODE[byte] = the 4 moves of the byte
+DECODE = [tuple((byte >> (2 * i)) & 3 for i in range(4)) for byte in range(256)]
+
+
+def board_format(rows, cols) -> str:
+    return 'B' if rows * cols <= 256 else 'H'
+
+
+class SolutionWriter:
+    '''
+        with SolutionWriter(path, board) as writer:
+            writer.write(moves)
+        moves are move codes or names ('left', ...)
+    '''
+
+    def __init__(self, path, board):
+        rows, cols = len(board), len(board[0])
+        self.file = open(path, 'wb')
+        self.count = 0
+        self.pending = 0  # the moves of the unfinished last byte
+        self.file.write(HEADER.pack(MAGIC, rows, cols, 0))
+        tiles = [int(tile) for row in board for tile in row]
+        self.file.write(struct.pack(f'<{len(tiles)}{board_format(rows, cols)}', *tiles))
+
+    def write(self, moves):
+        packed = bytearray()
+        pending, count = self.pending, self.count
+        for move in moves:
+            if isinstance(move, str):
+                try:
+                    move = MOVE_CODES[move]
+                except KeyError:
+                    raise ValueError(f'Unknown move: {move!r}') from None
+            pending |= move << (2 * (count & 3))
+            count += 1
+            if not count & 3:
+                packed.append(pending)
+                pending = 0
+        self.pending, self.count = pending, count
+        self.file.write(packed)
+
+    def close(self):
+        if self.file.closed:
+            return
+        if self.count & 3:
+            self.file.write(bytes((self.pending,)))
+        self.file.seek(COUNT_OFFSET)
+        self.file.write(struct.pack('<Q', self.count))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def pack_moves(moves) -> bytes:
+    '''
+        The moves (codes or names) 4 per byte, like in the files
+    '''
+    codes = [MOVE_CODES[move] if isinstance(move, str) else move for move in moves]
+    codes += [0] * (-len(codes) % 4)
+    return bytes(a | b << 2 | c << 4 | d << 6 for a, b, c, d in zip(*[iter(codes)] * 4))
+
+
+def unpack_moves(data, count, names=True) -> list:
+    moves = [move for byte in data for move in DECODE[byte]][:count]
+    return decode_moves(moves) if names else moves
+
+
+def write_solution(path, board, moves):
+    with SolutionWriter(path, board) as writer:
+        writer.write(moves)
+
+
+def is_legacy(path) -> bool:
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) != MAGIC
+
+
+def read_legacy(path) -> list:
+    '''
+        The moves (names) of a file in the old format
+    '''
+    with open(path) as f:
+        try:
+            moves = ast.literal_eval(f.read())
+        except (SyntaxError, ValueError):
+            moves = None
+    if not isinstance(moves, list):
+        raise ValueError(f'{path} is neither a solution file nor a list of moves')
+    for move in moves:
+        if not isinstance(move, str) or move not in MOVE_CODES:
+            raise ValueError(f'{path}: unknown move {move!r}')
+    return moves
+
+
+def read_header(f):
+    '''
+        returns the start board (list of rows) and the number of moves,
+        the file is left at the first move
+    '''
+    data = f.read(HEADER.size)
+    if len(data) < HEADER.size:
+        raise ValueError('Not a solution file, it is shorter than the header')
+    magic, rows, cols, count = HEADER.unpack(data)
+    if magic != MAGIC:
+        raise ValueError('Not a solution file')
+    fmt = board_format(rows, cols)
+    size = rows * cols * struct.calcsize(fmt)
+    data = f.read(size)
+    if len(data) < size:
+        raise ValueError(f'The solution file ends in its {rows}x{cols} board')
+    tiles = struct.unpack(f'<{rows * cols}{fmt}', data)
+    return [list(tiles[x * cols:(x + 1) * cols]) for x in range(rows)], count
+
+
+def read_board(path):
+    '''
+        returns the start board and the number of moves, without reading the moves
+    '''
+    with open(path, 'rb') as f:
+        return read_header(f)
+
+
+def iter_move_chunks(path, names=True):
+    '''
+        Yields the moves in lists of at most 4 * READ_CHUNK
+        names: yield 'left', ... instead of move codes
+    '''
+    if is_legacy(path):
+        moves = read_legacy(path)
+        yield moves if names else [MOVE_CODES[move] for move in moves]
+        return
+
+    with open(path, 'rb') as f:
+        _, missing = read_header(f)
+        while missing > 0:
+            data = f.read(READ_CHUNK)
+            if not data:
+                raise ValueError(f'{path} ends {missing} moves early')
+            moves = unpack_moves(data, missing, names=False)
+            missing -= len(moves)
+            yield decode_moves(moves) if names else moves
+
+
+def iter_moves(path, names=True):
+    for chunk in iter_move_chunks(path, names):
+        yield from chunk
+
+
+def read_solution(path, names=True):
+    '''
+        returns the start board (None for the old format) and all the moves
+    '''
+    board = None if is_legacy(path) else read_board(path)[0]
+    return board, list(iter_moves(path, names))
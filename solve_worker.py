@@ -0,0 +1,102 @@
+'''
+    Solving in the background
+
+    The game starts a SolveWorker and keeps running its event loop, the worker
+    thread solves a copy of the board and sends the moves back through a
+    queue. The searches check the stop flag regularly (should_stop), so a
+    solve can be cancelled any time. No pygame here.
+
+    Messages of the queue: (MOVES, list of move names), then (DONE, None),
+    (CANCELLED, None) or (ERROR, text).
+'''
+
+import numpy as np
+import queue
+import threading
+import time
+from solution_io import SolutionWriter, write_solution
+from solver import SOLVERS, iter_solution
+
+
+MOVES = 'moves'
+DONE = 'done'
+CANCELLED = 'cancelled'
+ERROR = 'error'
+# Chunks of a streamed solution waiting for the game at most, the worker waits if there are more
+QUEUE_CHUNKS = 64
+# s, how often a waiting worker checks the stop flag
+STOP_CHECK = 0.1
+
+
+class SolveWorker:
+    '''
+        stream: play the constructive solution tile by tile while it is found
+        options: more keyword arguments of the solver (time_budget and report of the anytime method)
+        cache: a SolutionCache, the solutions found are stored in it and it is asked first
+        The moves are also written to solution_file (as far as they got, if a stream is cancelled).
+    '''
+
+    def __init__(self, board, method, solution_file, stream=False, options=None, cache=None):
+        self.method = method
+        self.solution_file = solution_file
+        self.stream = stream
+        self.options = options or {}
+        self.cache = cache
+        self.queue = queue.Queue(QUEUE_CHUNKS)
+        self.stop = threading.Event()
+        self.moves_found = 0
+        self.start_time = time.perf_counter()
+        self.thread = threading.Thread(target=self.run, args=(np.array(board),), daemon=True)
+        self.thread.start()
+
+    def run(self, board):
+        try:
+            if self.stream:
+                with SolutionWriter(self.solution_file, board) as writer:
+                    for chunk in iter_solution(board):
+                        if self.stop.is_set():
+                            break
+                        writer.write(chunk)
+                        self.moves_found += len(chunk)
+                        self.put(MOVES, chunk)
+            else:
+                if self.cache is not None:
+                    solution = self.cache.solve(board, self.method, self.stop.is_set, **self.options)
+                else:
+                    solution = SOLVERS[self.method](board, should_stop=self.stop.is_set, **self.options)
+                if solution is not None:
+                    write_solution(self.solution_file, board, solution)
+                    self.moves_found = len(solution)
+                    self.put(MOVES, solution)
+        except Exception as error:  # the game shows it instead of the thread dying silently
+            self.put(ERROR, f'{type(error).__name__}: {error}')
+            return
+        self.put(CANCELLED if self.stop.is_set() else DONE)
+
+    def put(self, kind, data=None):
+        '''
+            Waits while the queue is full, gives up if the worker is cancelled
+        '''
+        while True:
+            try:
+                self.queue.put((kind, data), timeout=STOP_CHECK)
+                return
+            except queue.Full:
+                if self.stop.is_set() and kind == MOVES:
+                    return
+
+    def message(self) -> tuple:
+        '''
+            The next message without waiting, (None, None) if there is none
+        '''
+        try:
+            return self.queue.get_nowait()
+        except queue.Empty:
+            return None, None
+
+    def cancel(self):
+        self.stop.set()
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start_time
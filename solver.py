@@ -0,0 +1,386 @@
+'''
+    Headless constructive solver
+
+    Pure computation: no pygame, no PIL and no module level board globals.
+    Takes a 2D board (numpy array or nested lists) and returns the list of
+    moves ('left', 'right', 'up', 'down') that solves it, using the same
+    row-by-row method as the game.
+
+    iter_solution yields the moves tile by tile while they are found, so big
+    boards can be played or written without waiting for (and keeping) the
+    whole solution.
+
+    Usage: python solver.py board.csv
+    prints the moves one per line as they are found
+'''
+
+import numpy as np
+import sys
+from itertools import product
+from board_state import BoardState, decode_moves, LEFT, RIGHT, UP, DOWN
+import ida_star
+import pattern_db
+import perfect_table
+from ida_star import solve_optimal
+from optimizer import cancel_inverses, optimize
+from pattern_db import solve_pattern_db
+from perfect_table import solve_perfect
+from anytime import solve_anytime
+from puzzle import is_solvable
+
+
+# Fixed sequences of the method
+TAKE_OUT_LAST = (LEFT, UP, UP, RIGHT, DOWN, DOWN, LEFT)
+SWAP_IN_COL = (RIGHT, UP, LEFT, LEFT, DOWN, RIGHT, RIGHT, UP, LEFT, DOWN,
+               RIGHT, UP, LEFT, LEFT, DOWN, RIGHT, UP, LEFT, DOWN, RIGHT, RIGHT, UP, LEFT, DOWN)
+ROTATE_SQUARE = (LEFT, UP, RIGHT, DOWN, LEFT)
+# The constructive solution is about this many times the Manhattan distance
+LENGTH_PER_DISTANCE = 5
+
+
+class ConstructiveSolver:
+    '''
+        Solves the first rows one by one, then the last two rows column by column.
+        The board given to the constructor is not modified.
+        Works on a BoardState, moves are recorded as move codes.
+        first_rows and last_rows are generators, they yield the moves
+        after every tile or column, see iter_chunks.
+    '''
+
+    def __init__(self, board):
+        self.state = BoardState.from_board(board)
+        self.rows = self.state.rows
+        self.cols = self.state.cols
+        self.blank = self.state.blank
+        self.moves = []  # made since the last flush
+        self.flushed = 0
+
+    @property
+    def move_count(self) -> int:
+        return self.flushed + len(self.moves)
+
+    def flush(self):
+        '''
+            Yields the moves made since the last flush, if there are any
+        '''
+        if self.moves:
+            moves, self.moves = self.moves, []
+            self.flushed += len(moves)
+            yield moves
+
+    def at(self, tile) -> tuple:
+        '''
+            (row, col) of the tile
+        '''
+        return divmod(self.state.cell_of[tile], self.cols)
+
+    def make_move(self, move):
+        '''
+            Does not check if a move is valid
+        '''
+        self.state.make(move)
+        self.moves.append(move)
+
+    def do_movelist(self, movelist):
+        for move in movelist:
+            self.make_move(move)
+
+    def move_blank_to(self, x, y):
+        '''
+            Moves BLANK to the given coordinate: x,y
+        '''
+        at = self.at
+        # Moves in lines
+        while at(self.blank)[1] != y:
+            if at(self.blank)[1] < y:
+                self.make_move(LEFT)
+            else:
+                self.make_move(RIGHT)
+
+        # Moves in columns
+        while at(self.blank)[0] != x:
+            if at(self.blank)[0] < x:
+                self.make_move(UP)
+            else:
+                self.make_move(DOWN)
+
+    def move_tile_to(self, tile, x, y):
+        '''
+            Moves tile to the given coordinate: x,y
+            we don't touch tiles on the left and top of x, y
+                if not necessary.
+        '''
+        at = self.at
+        blank = self.blank
+
+        # Moves in lines
+        if at(tile)[0] == self.rows-1:  # If in the last row, take it out
+            self.move_blank_to(self.rows-2, at(blank)[1])
+            self.move_blank_to(at(tile)[0]-1, at(tile)[1])
+            self.make_move(UP)
+
+        while at(tile)[1] != y:
+            self.move_blank_to(at(tile)[0]+1, at(blank)[1])
+            if at(tile)[1] < y:
+                self.move_blank_to(at(tile)[0], at(tile)[1]+1)
+                self.make_move(RIGHT)
+            else:
+                self.move_blank_to(at(tile)[0], at(tile)[1]-1)
+                self.make_move(LEFT)
+
+        # If the BLANK and tile would be in the same row, it would get wrong
+        if at(tile)[0] == at(blank)[0] and at(tile)[1] > at(blank)[1]:
+            self.move_blank_to(at(tile)[0]+1, at(blank)[1])
+
+        # Moves in Column
+        if at(tile)[1] == self.cols-1:  # If in the last col, take it out
+            self.move_blank_to(at(blank)[0], self.cols-2)
+            self.move_blank_to(at(tile)[0], at(tile)[1]-1)
+            self.make_move(LEFT)
+
+        while at(tile)[0] != x:
+            self.move_blank_to(at(blank)[0], at(tile)[1]+1)
+            self.move_blank_to(at(tile)[0]-1, at(blank)[1])
+            self.move_blank_to(at(blank)[0], at(tile)[1])
+            self.make_move(UP)
+
+    def first_rows(self):
+        '''
+            Solves the first rows-2 rows
+        '''
+        cols = self.cols
+        at = self.at
+
+        for i, j in product(range(self.rows-2), range(cols)):
+            # Tries to move the correct tile into (i,j)
+
+            if j < cols-2:  # if not the last 2 columns
+                self.move_tile_to(i*cols+j, i, j)
+
+            # If the col before the last: we take here the last element
+            elif j == cols-2:
+                tile = i*cols+j+1
+
+                # If the last would be next to it, we would get stuck
+                if self.state.tiles[i*cols+j] == i*cols+j:
+                    self.move_blank_to(i, j)
+                    self.make_move(LEFT)
+                self.move_tile_to(tile, i, j)
+
+            else:  # Last column
+                # We take the elements before the last to their place,
+                # The last element will go to its place automatically
+                tile = i*cols+j-1
+                if at(self.blank) == (i, j):  # Solves: 0 1 3 15
+                    #  * * * 2
+                    self.make_move(UP)
+                if at(tile) == (i, j):  # Solves if the order: 0 1 3 2
+                    self.move_blank_to(i, j-1)
+                    self.do_movelist(TAKE_OUT_LAST)
+                    self.move_tile_to(tile+1, i, j-1)
+                self.move_tile_to(tile, i+1, j-1)
+                self.move_tile_to(tile, i, at(tile)[1])
+            yield from self.flush()
+
+    def swap_in_col(self):
+        self.do_movelist(SWAP_IN_COL)
+
+    def order_66(self):
+        '''
+            Finishes the M-3. column
+        '''
+        self.move_blank_to(self.rows-1, self.at(self.blank)[1])
+        self.move_blank_to(self.rows-1, self.cols-3)
+        self.do_movelist((DOWN, LEFT))
+
+    def finish_last_square(self):
+        '''
+            Order 66 garanties that the BLANK is on (N-1,M-1),
+            moves the (N-1,M-1) tile to its place and finishes the puzzle
+        '''
+        rows, cols = self.rows, self.cols
+        tile_upper = (rows-2) * cols + cols - 2  # tile (N-1, M-1)
+        if self.at(tile_upper) == (rows-1, cols - 2):
+            self.do_movelist((UP, LEFT))
+        elif self.at(tile_upper) == (rows-1, cols - 1):
+            self.do_movelist(ROTATE_SQUARE + (UP,))
+        else:
+            self.do_movelist((LEFT, UP))
+
+    def last_rows(self):
+        '''
+            Solves the last two rows of the puzzle column by column
+            (Solves a 2*M, within the 2*M box)
+        '''
+        rows, cols = self.rows, self.cols
+        at = self.at
+
+        if cols == 2:
+            self.move_blank_to(rows-2, cols-2)
+            self.finish_last_square()
+            yield from self.flush()
+            return
+
+        # We will start from the left side, and do a column in one loop
+        for j in range(cols-3):
+
+            # The two number we will be working with, in the solved state tile_upper supposed to
+            # be on the top of tile_below (this is for positions array)
+            tile_upper = (rows-2) * cols + j  # tile (N-1, j+1)
+            tile_below = (rows-1) * cols + j  # tile ( N , j+1)
+
+            # Completing the j.-th column consists of 3 steps:
+            # 1. Move the "below" tile to coordinates (N-1 , j) (The N-1.th row, and j.-th column)
+            # 2. Check whether the "upper" tile is below the "below" tile
+            #       - In this case, there is a series of steps, to put them in order
+            # 3. If not, then move the "upper" tile to the right of "below"
+            # 4. Move the BLANK under "below", then you can just do a "down" and "left" move and
+            #      the column will be completed (when moving BLANK we dont disturb "below" and "upper")
+            #   ROWS\COL         i                                i
+            #   (N-1)   [ DONE |          ]     1.      [ DONE |"below"       ]     3.
+            #   (N  )   [ DONE |          ]   ------>   [ DONE |              ]  ------->
+            #                      i
+            #   (N-1)   [ DONE |"below" "upper"]     4.      [ DONE |"below" "upper"]    4,5.
+            #   (N  )   [ DONE |               ]   ------>   [ DONE | BLANK         ]  ------->
+            #
+            #   (N-1)   [ DONE |"upper"  BLANK ]
+            #   (N  )   [ DONE |"below"        ]
+            #
+            #   If, after the first step, "upper" is below "below", we can get to the end in one step
+
+            # 1. Move the "below" tile to coordinates (N-1 , j)
+            self.move_tile_to(tile_below, rows-2, j)
+            self.move_blank_to(rows-2, j+1)
+
+            # 2. If "upper" is below "below" we can just swap them
+            if at(tile_upper) == (rows-1, j):
+                self.swap_in_col()
+            else:
+                # 3. else move the "upper" tile to the right of "below"
+                self.move_tile_to(tile_upper, rows-2, j+1)
+                # move BLANK below "below" (first to the N.-th row, then below "below")
+                self.move_blank_to(rows-1, at(self.blank)[1])
+                self.move_blank_to(rows-1, j)
+                # make a "down" and a "left" move, to finish the column
+                self.do_movelist((DOWN, LEFT))
+            yield from self.flush()
+
+        # Last six tile
+        # The N-2.th column
+        tile_upper = (rows-2) * cols + cols - 3  # tile (N-1, N-2)
+        tile_below = (rows-1) * cols + cols - 3  # tile ( N , N-2)
+
+        # Move the "below" tile to (N-1, M-2), then BLANK to (N-1, M-1)
+        self.move_tile_to(tile_below, rows-2, cols-3)
+        self.move_blank_to(rows-2, cols-2)
+
+        # if "upper" is below "below" we can swap
+        if at(tile_upper) == (rows-1, cols-3):
+            self.swap_in_col()
+        # if not, then we move the "upper" tile beside "below" tile, then finish the column
+        elif at(tile_upper) == (rows-1, cols-2):
+            self.make_move(UP)
+            self.order_66()
+        elif at(tile_upper) == (rows-1, cols-1):
+            self.do_movelist(ROTATE_SQUARE)
+            self.order_66()
+        else:
+            self.make_move(LEFT)
+            self.order_66()
+        self.finish_last_square()
+        yield from self.flush()
+
+    def is_first_rows_solved(self):
+        tiles = self.state.tiles
+        return all(tiles[i] == i for i in range((self.rows-2) * self.cols))
+
+    def iter_chunks(self):
+        '''
+            Yields lists of move codes, the moves of a tile or a column at once
+        '''
+        if not self.is_first_rows_solved():
+            yield from self.first_rows()
+        yield from self.last_rows()
+
+    def solve(self) -> list:
+        '''
+            returns the move codes
+        '''
+        moves = []
+        for chunk in self.iter_chunks():
+            moves.extend(chunk)
+        return moves
+
+
+def solve_board(board, window=None, should_stop=None) -> list:
+    '''
+        Returns the moves solving the board, the board is not changed.
+        The board has to be solvable.
+        The moves that undo each other or come back to an earlier board are left out,
+        with a window, every window long part is also replaced with a shortest one.
+        should_stop: optional function, checked after every tile, returns None if it returns True
+    '''
+    moves = []
+    for chunk in ConstructiveSolver(board).iter_chunks():
+        if should_stop is not None and should_stop():
+            return None
+        moves.extend(chunk)
+    return decode_moves(optimize(board, moves, window))
+
+
+def iter_solution(board, names=True):
+    '''
+        Yields lists of moves while the constructive solver finds them,
+        the moves that undo each other are left out within a list.
+        The board is copied right away, it may change while the moves are used.
+        names: lists of 'left', ... instead of move codes
+    '''
+    solver = ConstructiveSolver(board)
+    chunks = (cancel_inverses(chunk) for chunk in solver.iter_chunks())
+    return (decode_moves(chunk) for chunk in chunks) if names else chunks
+
+
+def estimate_length(board) -> int:
+    '''
+        About the number of moves iter_solution yields, for pacing a playback
+    '''
+    state = BoardState.from_board(board)
+    cols = state.cols
+    distance = sum(abs(cell // cols - tile // cols) + abs(cell % cols - tile % cols)
+                   for cell, tile in enumerate(state.tiles) if tile != state.blank)
+    return max(LENGTH_PER_DISTANCE * distance, 1)
+
+
+# Solving methods selectable from the game and the command line
+SOLVERS = {'constructive': solve_board,
+           'optimal': solve_optimal,
+           'pdb': solve_pattern_db,
+           'perfect': solve_perfect,
+           'anytime': solve_anytime}
+# The methods that only solve some sizes: (rows, cols) -> bool
+SUPPORTS = {'optimal': ida_star.supports, 'pdb': pattern_db.supports, 'perfect': perfect_table.supports}
+
+
+def methods_for(rows, cols) -> list:
+    '''
+        The methods of SOLVERS that solve boards of this size
+    '''
+    return [method for method in SOLVERS if method not in SUPPORTS or SUPPORTS[method](rows, cols)]
+
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit('Usage: python solver.py board.csv')
+    board = np.genfromtxt(sys.argv[1], delimiter=',', dtype=int)
+    try:
+        if not is_solvable(board):
+            sys.exit('This board is not solvable!')
+    except ValueError as error:
+        sys.exit(f'{sys.argv[1]}: {error}')
+    for chunk in filter(None, iter_solution(board)):
+        sys.stdout.write('\n'.join(chunk) + '\n')
+        sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+'''
+    Moves on many boards at once
+
+    Boards are a (K, rows, cols) array, changed in place, with a (K,) vector of
+    the BLANK cells (cells are numbered row by row). One call makes one move on
+    every board, with fancy indexing instead of a Python loop over the boards.
+    Moves are the codes of board_state, NO_MOVE (-1) leaves a board alone.
+    A move that is not valid on a board (see is_valid_move in the game) is not made.
+'''
+
+import numpy as np
+from functools import lru_cache
+from board_state import MOVES, NO_CELL, move_tables
+
+
+NO_MOVE = -1
+
+
+@lru_cache(maxsize=None)
+def transition_table(rows, cols):
+    '''
+        returns a (rows*cols, 4) array: [cell, move] is the new BLANK cell or NO_CELL
+    '''
+    table = np.array(move_tables(rows, cols).target, dtype=np.intp).reshape(-1, len(MOVES))
+    table.flags.writeable = False
+    return table
+
+
+def blank_cells(boards):
+    '''
+        returns the (K,) BLANK cells of a (K, rows, cols) stack
+    '''
+    count, rows, cols = boards.shape
+    return np.argmax(boards.reshape(count, -1) == rows * cols - 1, axis=1)
+
+
+def valid_moves(blanks, moves, rows, cols):
+    '''
+        returns a (K,) bool mask, True where the move can be made
+    '''
+    moves = np.asarray(moves)
+    target = transition_table(rows, cols)[blanks, moves]
+    return (moves != NO_MOVE) & (target != NO_CELL)
+
+
+def apply_moves(boards, blanks, moves):
+    '''
+        Makes moves[k] on boards[k], changes boards and blanks in place
+        returns the (K,) mask of the boards where the move was made
+    '''
+    count, rows, cols = boards.shape
+    if not boards.flags.c_contiguous:
+        raise ValueError('The boards have to be a C contiguous array, they are changed in place')
+    flat = boards.reshape(count, -1)
+    moves = np.asarray(moves)
+    target = transition_table(rows, cols)[blanks, moves]
+    made = np.flatnonzero((moves != NO_MOVE) & (target != NO_CELL))
+    old, new = blanks[made], target[made]
+    flat[made, old] = flat[made, new]
+    flat[made, new] = rows * cols - 1
+    blanks[made] = new
+    valid = np.zeros(count, dtype=bool)
+    valid[made] = True
+    return valid
+
+
+def apply_sequences(boards, blanks, moves, stop_at_invalid=True):
+    '''
+        moves: (K, L) matrix, row k is the sequence of boards[k], padded with NO_MOVE
+        stop_at_invalid: after an invalid move the rest of the board's sequence is skipped
+        returns the (K, L) mask of the moves that were made
+    '''
+    moves = np.asarray(moves)
+    made = np.zeros(moves.shape, dtype=bool)
+    if stop_at_invalid:
+        moves = moves.copy()
+    for step in range(moves.shape[1]):
+        made[:, step] = apply_moves(boards, blanks, moves[:, step])
+        if stop_at_invalid:
+            failed = ~made[:, step] & (moves[:, step] != NO_MOVE)
+            moves[failed, step:] = NO_MOVE
+    return made
+
+
+def random_moves(rng, blanks, previous, rows, cols):
+    '''
+        returns a valid random move for every board, never the inverse of previous
+        previous: the last moves, NO_MOVE where there was none
+    '''
+    count = len(blanks)
+    allowed = transition_table(rows, cols)[blanks] != NO_CELL
+    undo = np.flatnonzero(previous != NO_MOVE)
+    allowed[undo, previous[undo] ^ 1] = False
+    return np.argmax(rng.random((count, len(MOVES))) * allowed, axis=1)
+
+
+def scramble(boards, blanks, length, rng):
+    '''
+        Makes length random moves on every board, in place
+        returns the (K, length) matrix of the moves
+    '''
+    count, rows, cols = boards.shape
+    moves = np.empty((count, length), dtype=np.int8)
+    previous = np.full(count, NO_MOVE)
+    for step in range(length):
+        previous = random_moves(rng, blanks, previous, rows, cols)
+        apply_moves(boards, blanks, previous)
+        moves[:, step] = previous
+    return moves
@@ -0,0 +1,283 @@
+'''
+    Checking solutions
+
+    Replays many (board, moves) pairs at once and tells for every board
+    whether all the moves were valid (the rules of is_valid_move in the game),
+    the index of the first invalid move, and whether the board ends solved.
+    The moves after an invalid one are not made.
+
+    There is no loop over the moves: the BLANK's path is the cumulative sum
+    of the move offsets, a move is valid if the path stays on the board. When
+    the BLANK leaves a cell, it leaves behind the tile it finds on the next
+    cell of its path: the tile left there at the BLANK's previous visit, or
+    the starting one. These links are followed with pointer jumping, and a
+    cell ends with what the BLANK left there at its last visit.
+
+    Usage: python verify.py [-v] solution.slv ...
+           python verify.py -b board.csv solution.txt   (the old format has no board)
+           python verify.py --results results.jsonl      (the output of batch.py)
+           python verify.py --self-check [--seed S]     (compares verify with vectorized.apply_sequences)
+    The exit code is 1 if a solution does not solve its board, or the self check fails.
+'''
+
+import json
+import numpy as np
+import sys
+import time
+from getopt import getopt
+from sys import argv
+from board_state import MOVE_CODES, OFFSETS
+from dataset import open_dataset
+from puzzle import generate_puzzles, validate_boards
+from solution_io import is_legacy, read_header, read_legacy
+from vectorized import NO_MOVE, apply_sequences, blank_cells
+
+
+ROW_STEPS = np.array([row for row, _ in OFFSETS], dtype=np.intp)
+COL_STEPS = np.array([col for _, col in OFFSETS], dtype=np.intp)
+SHIFTS = np.array([0, 2, 4, 6], dtype=np.uint8)
+# Random stacks of boards the self check verifies, and their limits
+SELF_CHECK_TRIALS = 200
+SELF_CHECK_SIDE = 6
+SELF_CHECK_BOARDS = 20
+SELF_CHECK_MOVES = 40
+
+
+def encode(moves):
+    '''
+        Move names or codes as an int8 array of codes
+    '''
+    if len(moves) and isinstance(moves[0], str):
+        try:
+            return np.fromiter(map(MOVE_CODES.__getitem__, moves), dtype=np.int8, count=len(moves))
+        except KeyError as error:
+            raise ValueError(f'Unknown move: {error}') from None
+    return np.asarray(moves, dtype=np.int8)
+
+
+def read_codes(path):
+    '''
+        returns the start board (None for the old format) and the moves as an array of codes
+    '''
+    if is_legacy(path):
+        return None, encode(read_legacy(path))
+    with open(path, 'rb') as f:
+        board, count = read_header(f)
+        data = np.fromfile(f, dtype=np.uint8, count=(count + 3) // 4)
+    if len(data) * 4 < count:
+        raise ValueError(f'{path} ends {count - len(data) * 4} moves early')
+    return board, ((data[:, None] >> SHIFTS) & 3).ravel()[:count].astype(np.int8)
+
+
+def verify(boards, solutions) -> dict:
+    '''
+        boards: (K, rows, cols) stack, solutions: K lists of move names or codes
+        returns {'valid': (K,) bool, 'first_invalid': (K,) index or -1, 'solved': (K,) bool,
+                 'boards': the (K, rows, cols) boards after the valid moves}
+    '''
+    boards = np.asarray(boards)
+    count, rows, cols = boards.shape
+    size = rows * cols
+    solutions = [encode(moves) for moves in solutions]
+    lengths = np.array([len(moves) for moves in solutions], dtype=np.intp)
+    moves = np.concatenate(solutions) if solutions else np.empty(0, dtype=np.int8)
+    if moves.size and (moves.min() < 0 or moves.max() >= len(OFFSETS)):
+        raise ValueError('Move codes are 0..3')
+    starts = np.cumsum(lengths) - lengths  # the first move of every board in moves
+    owner = np.repeat(np.arange(count), lengths)
+    blank_row, blank_col = np.divmod(blank_cells(boards), cols)
+
+    # The BLANK after every move, the cumulative sums restart at every board
+    def path(steps, start):
+        total = np.cumsum(steps[moves])
+        before = np.concatenate(([0], total))[starts]
+        return total - before[owner] + start[owner]
+    row, col = path(ROW_STEPS, blank_row), path(COL_STEPS, blank_col)
+
+    invalid = np.flatnonzero((row < 0) | (row >= rows) | (col < 0) | (col >= cols))
+    first_invalid = np.full(count, -1, dtype=np.intp)
+    failed, first = np.unique(owner[invalid], return_index=True)
+    first_invalid[failed] = invalid[first] - starts[failed]
+    made = np.where(first_invalid >= 0, first_invalid, lengths)
+
+    # Nodes: the BLANK's cell before the first move and after every valid one, board by board
+    node_owner = np.repeat(np.arange(count), made + 1)
+    node_starts = np.cumsum(made + 1) - (made + 1)
+    step = np.arange(len(node_owner)) - node_starts[node_owner]
+    cell = blank_row[node_owner] * cols + blank_col[node_owner]
+    moved = np.flatnonzero(step)
+    index = starts[node_owner[moved]] + step[moved] - 1
+    cell[moved] = row[index] * cols + col[index]
+    where = node_owner * size + cell  # the cell in the flat stack of boards
+
+    # The previous visit of every node's cell
+    # the smallest type of the cells, up to 16 bits numpy sorts them with a radix sort
+    order = np.argsort(where.astype(np.min_scalar_type(count * size)), kind='stable')
+    ordered = where[order]
+    same = ordered[1:] == ordered[:-1]
+    previous = np.full(len(where), -1, dtype=np.intp)
+    previous[order[1:][same]] = order[:-1][same]
+
+    # found[i]: the tile the BLANK finds arriving at node i, the one left at the previous visit
+    # (the next node after it) or the starting one
+    flat = boards.reshape(-1)
+    index_type = np.int32 if len(where) < 1 << 31 else np.intp  # half the memory to jump around in
+    link = np.where(previous >= 0, previous + 1, np.arange(len(where))).astype(index_type)
+    active = np.flatnonzero(previous >= 0).astype(index_type)
+    while active.size:  # only the nodes not linked to a starting tile yet
+        jumped = link[link[active]]
+        link[active] = jumped
+        active = active[link[jumped] != jumped]
+    found = flat[where[link]]
+
+    final = flat.copy()
+    last = order[np.append(~same, True)]  # the last visit of every cell
+    left = last[step[last] < made[node_owner[last]]]
+    final[where[left]] = found[left + 1]
+    final[where[node_starts + made]] = size - 1
+    final = final.reshape(boards.shape)
+
+    valid = first_invalid < 0
+    solved = valid & np.all(final.reshape(count, -1) == np.arange(size), axis=1)
+    return {'valid': valid, 'first_invalid': first_invalid, 'solved': solved, 'boards': final}
+
+
+def self_check(trials=SELF_CHECK_TRIALS, seed=None) -> list:
+    '''
+        Verifies random move lists (mostly with invalid moves) on random boards, and compares
+        first_invalid, solved and the boards with vectorized.apply_sequences, which makes one move at a time
+        returns the (trial, rows, cols) of the stacks that did not match
+    '''
+    rng = np.random.default_rng(seed)
+    failed = []
+    for trial in range(trials):
+        rows, cols = (int(side) for side in rng.integers(1, SELF_CHECK_SIDE + 1, size=2))
+        count = int(rng.integers(1, SELF_CHECK_BOARDS + 1))
+        boards = generate_puzzles(count, rows, cols, seed=rng, scramble=int(rng.integers(SELF_CHECK_MOVES)))
+        lengths = rng.integers(SELF_CHECK_MOVES + 1, size=count)
+        solutions = [rng.integers(len(OFFSETS), size=length) for length in lengths]
+
+        result = verify(boards, solutions)
+
+        expected = boards.copy()  # apply_sequences changes it in place
+        moves = np.full((count, max(lengths) + 1), NO_MOVE)  # a column even if every list is empty
+        for k, codes in enumerate(solutions):
+            moves[k, :len(codes)] = codes
+        made = apply_sequences(expected, blank_cells(expected), moves)
+        missed = ~made & (moves != NO_MOVE)
+        first_invalid = np.where(missed.any(axis=1), np.argmax(missed, axis=1), -1)
+        solved = (first_invalid < 0) & np.all(expected.reshape(count, -1) == np.arange(rows * cols), axis=1)
+        if not (np.array_equal(result['first_invalid'], first_invalid)
+                and np.array_equal(result['boards'], expected) and np.array_equal(result['solved'], solved)):
+            failed.append((trial, rows, cols))
+    return failed
+
+
+def results_pairs(path) -> list:
+    '''
+        (name, board, moves) of every solved line of a batch.py result file
+    '''
+    pairs = []
+    datasets = {}
+    with open(path) as f:
+        for line in f:
+            result = json.loads(line)
+            if 'moves' not in result:
+                continue
+            if 'index' in result:
+                if result['file'] not in datasets:
+                    datasets[result['file']] = open_dataset(result['file'], validate=False)
+                board = datasets[result['file']][result['index']]
+                name = f'{result["file"]}[{result["index"]}]'
+            else:
+                board = np.genfromtxt(result['file'], delimiter=',', dtype=int, ndmin=2)
+                name = result['file']
+            pairs.append((name, board, result['moves']))
+    return pairs
+
+
+def verify_pairs(pairs) -> list:
+    '''
+        Verifies (name, board, moves) triples, boards of the same size together
+        returns (name, valid, first_invalid, solved) in the order of the pairs
+    '''
+    groups = {}
+    for number, (_, board, _) in enumerate(pairs):
+        groups.setdefault(np.shape(board), []).append(number)
+    reports = [None] * len(pairs)
+    for numbers in groups.values():
+        boards = np.array([pairs[number][1] for number in numbers])
+        validate_boards(boards)
+        result = verify(boards, [pairs[number][2] for number in numbers])
+        for k, number in enumerate(numbers):
+            reports[number] = (pairs[number][0], bool(result['valid'][k]),
+                               int(result['first_invalid'][k]), bool(result['solved'][k]))
+    return reports
+
+
+def main(args=None):
+    '''
+        args: the command line arguments, sys.argv[1:] if not given
+    '''
+    board_file = None
+    results = []
+    verbose = False
+    check = False
+    seed = None
+    opts, files = getopt(argv[1:] if args is None else args, "b:v",
+                         ["board=", "results=", "verbose", "self-check", "seed="])
+    for opt, val in opts:
+        if opt in ("--board", "-b"):
+            board_file = val
+        elif opt == "--results":
+            results.append(val)
+        elif opt in ("--verbose", "-v"):
+            verbose = True
+        elif opt == "--self-check":
+            check = True
+        elif opt == "--seed":
+            seed = int(val)
+
+    if check:
+        failed = self_check(seed=seed)
+        for trial, rows, cols in failed:
+            print(f'Trial {trial} ({rows}x{cols}): verify and apply_sequences differ')
+        print(f'{SELF_CHECK_TRIALS} random stacks of boards, {len(failed)} differ')
+        return 1 if failed else 0
+
+    pairs = []
+    try:
+        for path in results:
+            pairs.extend(results_pairs(path))
+        for path in files:
+            board, moves = read_codes(path)
+            if board is None:
+                if board_file is None:
+                    sys.exit(f'{path} has no board, give one with -b')
+                board = np.genfromtxt(board_file, delimiter=',', dtype=int, ndmin=2)
+            pairs.append((path, board, moves))
+        if not pairs:
+            sys.exit(__doc__)
+
+        start = time.perf_counter()
+        reports = verify_pairs(pairs)
+        seconds = time.perf_counter() - start
+    except (OSError, ValueError) as error:
+        sys.exit(str(error))
+
+    moves = sum(len(moves) for _, _, moves in pairs)
+    for name, valid, first_invalid, solved in reports:
+        if not valid:
+            print(f'{name}: move {first_invalid} is not valid')
+        elif not solved:
+            print(f'{name}: the board is not solved')
+        elif verbose:
+            print(f'{name}: solved')
+    unsolved = sum(not solved for *_, solved in reports)
+    print(f'{len(reports)} solutions, {moves} moves: {len(reports) - unsolved} solved, {unsolved} not, '
+          f'{moves / seconds if seconds else 0:,.0f} moves/s')
+    return 1 if unsolved else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())